@@ -1,19 +1,9 @@
 from app import create_app, db
 
-# Create the Flask app using the factory pattern
+# Create the Flask app using the factory pattern; it serves the React
+# frontend as well (see app/frontend.py)
 app = create_app()
 
-# -----------------------------------
-# 5️⃣ Serve React Frontend
-# -----------------------------------
-@app.route('/')
-@app.route('/<path:path>')
-def serve_react(path=""):
-    if path != "" and os.path.exists(os.path.join(app.static_folder, path)):
-        return send_from_directory(app.static_folder, path)
-    else:
-        return send_from_directory(app.static_folder, "index.html")
-
 # -----------------------------------
 # 6️⃣ Run App with DB Check
 # -----------------------------------
@@ -3,24 +3,69 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_cors import CORS
 from .config import Config
+from .cache import TTLCache, create_response_cache
+from .hashing import PasswordHasher
+from .pool import engine_options, install_sqlite_statement_timeout
+from .instrumentation import init_instrumentation
+from .metrics import init_metrics
+from .compression import init_compression
+from .frontend import init_frontend
+from .serialization import json_provider
+from .routing import RoutingSession, REPLICA_BIND, init_routing
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.json = json_provider(app)
     
     # Enable CORS for all routes with simpler configuration
     CORS(app, origins="*")
     
     # Initialize extensions
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    if app.config['REPLICA_DATABASE_URL']:
+        # Optional read replica used by GET requests (see routing.py)
+        app.config.setdefault('SQLALCHEMY_BINDS', {
+            REPLICA_BIND: dict(
+                engine_options(app.config, app.config['REPLICA_DATABASE_URL']),
+                url=app.config['REPLICA_DATABASE_URL']
+            )
+        })
     db.init_app(app)
     migrate.init_app(app, db)
+    init_routing(db)
+    with app.app_context():
+        for engine in db.engines.values():
+            install_sqlite_statement_timeout(engine, app.config['DB_STATEMENT_TIMEOUT_MS'])
+    init_instrumentation(app, db)
+    
+    # Per-process caches
+    app.extensions['principal_cache'] = TTLCache(
+        maxsize=app.config['PRINCIPAL_CACHE_SIZE'],
+        ttl=app.config['PRINCIPAL_CACHE_TTL']
+    )
+    app.extensions['token_version_cache'] = TTLCache(
+        maxsize=app.config['TOKEN_VERSION_CACHE_SIZE'],
+        ttl=app.config['TOKEN_VERSION_CACHE_TTL']
+    )
+    app.extensions['password_hasher'] = PasswordHasher(
+        workers=app.config['PASSWORD_HASH_WORKERS'],
+        queue_size=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+        iterations=app.config['PASSWORD_HASH_ITERATIONS'],
+        wait_timeout=app.config['PASSWORD_HASH_WAIT_TIMEOUT']
+    )
+    app.extensions['response_cache'] = create_response_cache(app.config)
+    init_metrics(app)
+    # Registered last so it runs first among the after_request hooks, and
+    # the Server-Timing total includes the compression time
+    init_compression(app)
     
     # Import and register blueprints
     from .routes import bp as api_bp
@@ -29,7 +74,15 @@ def create_app():
     app.register_blueprint(api_bp, url_prefix='/api')
     print("Blueprint registered successfully")
     
-    # Import models to ensure they are registered with SQLAlchemy
-    from . import models
+    # The React build, if one is deployed to app/static
+    init_frontend(app)
+    
+    # Import models to ensure they are registered with SQLAlchemy, along
+    # with the search index DDL attached to the posts table
+    from . import models, search
+    
+    # Register CLI commands
+    from .commands import register_commands
+    register_commands(app)
     
     return app
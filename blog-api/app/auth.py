@@ -1,7 +1,90 @@
 from functools import wraps
-from flask import request, jsonify, current_app
+from flask import request, jsonify, current_app, g
 import jwt
-from .models import User
+from . import db
+from .models import User, RoleMixin
+
+
+class Principal(RoleMixin):
+    """The authenticated caller as seen by the routes: id, username and role"""
+    
+    __slots__ = ('id', 'username', 'role', 'token_version')
+    
+    def __init__(self, id, username, role, token_version=0):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.token_version = token_version
+    
+    @classmethod
+    def from_user(cls, user):
+        return cls(user.id, user.username, user.role, user.token_version or 0)
+    
+    @classmethod
+    def from_claims(cls, data):
+        return cls(data['user_id'], data['username'], data['role'], data.get('ver', 0))
+
+
+def principal_cache():
+    return current_app.extensions['principal_cache']
+
+
+def token_version_cache():
+    return current_app.extensions['token_version_cache']
+
+
+def current_token_version(user_id):
+    """Return the user's token_version, or None if the user does not exist"""
+    cache = token_version_cache()
+    version = cache.get(user_id)
+    if version is None:
+        version = db.session.query(User.token_version).filter_by(id=user_id).scalar()
+        if version is None:
+            return None
+        cache.set(user_id, version)
+    return version
+
+
+def load_principal(user_id):
+    """Return the Principal for user_id, from the cache when possible"""
+    cache = principal_cache()
+    principal = cache.get(user_id)
+    if principal is None:
+        user = db.session.get(User, user_id)
+        if not user:
+            return None
+        principal = Principal.from_user(user)
+        cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_principal(user_id):
+    principal_cache().delete(user_id)
+    token_version_cache().delete(user_id)
+
+
+# Drop cached principals whenever a user row changes or goes away, so a
+# role change, revocation or deletion takes effect on this process's next
+# request. Ids are noted at flush and evicted only after the commit: an
+# earlier eviction lets a concurrent request cache the old row again.
+_CHANGED_USERS = 'changed_user_ids'
+
+@db.event.listens_for(User, 'after_update')
+@db.event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    db.inspect(target).session.info.setdefault(_CHANGED_USERS, set()).add(target.id)
+
+@db.event.listens_for(db.session, 'after_commit')
+def _evict_changed_users(session):
+    user_ids = session.info.pop(_CHANGED_USERS, None)
+    if user_ids and current_app:
+        for user_id in user_ids:
+            invalidate_principal(user_id)
+
+@db.event.listens_for(db.session, 'after_rollback')
+def _forget_changed_users(session):
+    # The changes were never committed, so the cached rows are still right
+    session.info.pop(_CHANGED_USERS, None)
 
 def token_required(f):
     @wraps(f)
@@ -22,10 +105,23 @@ def token_required(f):
                 current_app.config['SECRET_KEY'],
                 algorithms=['HS256']
             )
-            current_user = User.query.get(data['user_id'])
+            if current_app.config['JWT_STATELESS'] and 'role' in data:
+                # Authorize from the signed claims; only the version map is consulted
+                current_user = Principal.from_claims(data)
+                version = current_token_version(current_user.id)
+                if version is None:
+                    return jsonify({'message': 'User not found!'}), 401
+            else:
+                current_user = load_principal(data['user_id'])
+                if not current_user:
+                    return jsonify({'message': 'User not found!'}), 401
+                version = current_user.token_version
+            
+            if data.get('ver', 0) != version:
+                return jsonify({'message': 'Token has been revoked!'}), 401
             
-            if not current_user:
-                return jsonify({'message': 'User not found!'}), 401
+            # Used to route this user's reads (see routing.py)
+            g.current_user_id = current_user.id
                 
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired!'}), 401
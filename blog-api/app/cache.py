@@ -0,0 +1,254 @@
+import json
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from flask import current_app
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after ttl seconds.
+
+    Each worker process holds its own instance, so entries are only as
+    fresh as the ttl allows when another process changes the data.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None
+            }
+
+
+# -------------------- Response cache --------------------
+def _counter_start():
+    """Where a new counter starts: above any value an expired counter of
+    the same name reached, so generations are never reused"""
+    return int(time.time() * 1000000)
+
+
+class LocalCacheBackend:
+    """Response cache storage held in this process's memory"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        # Counters and flags live outside the LRU so they can never be
+        # evicted, only expire
+        self._counters = {}
+        self._prune_counters_at = 1024
+        self._flags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        counter = self._counters.get(key)
+        if counter is not None:
+            value, expires_at = counter
+            return value if expires_at is None or expires_at > time.monotonic() else None
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._cache.set(key, value, ttl)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def incr(self, key, ttl=None):
+        """Add one to a counter; with ttl it expires ttl seconds after its
+        last increment"""
+        now = time.monotonic()
+        with self._lock:
+            # Drop expired counters as new ones come in, so they cannot pile up
+            if len(self._counters) >= self._prune_counters_at:
+                self._counters = {k: c for k, c in self._counters.items() if c[1] is None or c[1] > now}
+                self._prune_counters_at = max(1024, 2 * len(self._counters))
+            value, expires_at = self._counters.get(key, (None, None))
+            if value is None or (expires_at is not None and expires_at <= now):
+                value = _counter_start()
+            value += 1
+            self._counters[key] = (value, now + ttl if ttl else None)
+            return value
+
+    def flag(self, key, ttl):
+        """Raise a flag for ttl seconds; unlike cached values it is never evicted"""
+        now = time.monotonic()
+        with self._lock:
+            # Drop expired flags as new ones come in, so they cannot pile up
+            if len(self._flags) >= 1024:
+                self._flags = {k: at for k, at in self._flags.items() if at > now}
+            self._flags[key] = now + ttl
+
+    def flagged(self, key):
+        expires_at = self._flags.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+
+class SharedCacheBackend:
+    """Response cache storage in a server shared by all workers.
+
+    client is anything with redis-py's get/set(ex=, nx=)/delete/incr/expire,
+    zadd/zscore/zremrangebyscore and pipeline methods, so a Redis connection
+    or a local stand-in both fit. Cached values and generation counters
+    carry a TTL while the flag set does not, so with maxmemory-policy
+    volatile-lru (or noeviction) the flags are never evicted. An evicted
+    generation restarts above its old values, like an expired one.
+    """
+
+    FLAGS_KEY = 'flags'
+
+    def __init__(self, client, prefix='bloghub:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key, ttl=None):
+        key = self.prefix + key
+        if ttl is None:
+            return self.client.incr(key)
+        # A new or expired counter starts above any old value, as locally
+        pipe = self.client.pipeline()
+        pipe.set(key, _counter_start(), nx=True, ex=ttl)
+        pipe.incr(key)
+        pipe.expire(key, ttl)
+        return pipe.execute()[1]
+
+    def flag(self, key, ttl):
+        # Flags are members of one sorted set scored by expiry time
+        now = time.time()
+        self.client.zremrangebyscore(self.prefix + self.FLAGS_KEY, '-inf', now)
+        self.client.zadd(self.prefix + self.FLAGS_KEY, {key: now + ttl})
+
+    def flagged(self, key):
+        expires_at = self.client.zscore(self.prefix + self.FLAGS_KEY, key)
+        return expires_at is not None and expires_at > time.time()
+
+
+CachedResponse = namedtuple('CachedResponse', 'body etag')
+
+
+class ResponseCache:
+    """Serialized JSON responses for published posts and post listings.
+
+    Keys embed a generation number: one per post, and one for every
+    listing page. Invalidating bumps it, retiring the old entries. Callers
+    take the key before reading the database, so a response built from rows
+    read before an invalidation is stored under a retired key and never
+    served. Generations are counters that expire generation_ttl seconds
+    after their last bump, so one per post ever edited does not pile up. A
+    generation that expired restarts above its old values, so entries
+    stored before that are never served again.
+    """
+
+    LISTING_GENERATION_KEY = 'posts:generation'
+
+    # Generations outlive every entry keyed by them: an entry lives ttl
+    # seconds after being stored, by a request that read the generation at
+    # most this long before
+    GENERATION_TTL_MARGIN = 3600
+
+    def __init__(self, backend, ttl=300):
+        self.backend = backend
+        self.ttl = ttl
+        self.generation_ttl = ttl + self.GENERATION_TTL_MARGIN
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.backend.get(key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        data = json.loads(raw)
+        return CachedResponse(data['body'].encode(), data['etag'])
+
+    def set(self, key, body, etag):
+        self.backend.set(key, json.dumps({'body': body.decode(), 'etag': etag}), self.ttl)
+
+    def post_key(self, post_id):
+        generation = int(self.backend.get(f'post:{post_id}:generation') or 0)
+        return f'post:{post_id}:{generation}'
+
+    def listing_key(self, *parts):
+        generation = int(self.backend.get(self.LISTING_GENERATION_KEY) or 0)
+        return ':'.join(['posts', str(generation)] + [str(part) for part in parts])
+
+    def invalidate_post(self, post_id):
+        self.backend.incr(f'post:{post_id}:generation', self.generation_ttl)
+
+    def invalidate_listing(self):
+        self.backend.incr(self.LISTING_GENERATION_KEY, self.generation_ttl)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else None
+        }
+
+
+def create_response_cache(config):
+    """Build the response cache selected by RESPONSE_CACHE_URL"""
+    url = config['RESPONSE_CACHE_URL']
+    if url:
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RESPONSE_CACHE_URL is set but the redis package is not installed')
+        backend = SharedCacheBackend(redis.Redis.from_url(url))
+    else:
+        backend = LocalCacheBackend(maxsize=config['RESPONSE_CACHE_SIZE'], ttl=config['RESPONSE_CACHE_TTL'])
+    return ResponseCache(backend, ttl=config['RESPONSE_CACHE_TTL'])
+
+
+def response_cache():
+    return current_app.extensions['response_cache']
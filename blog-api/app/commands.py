@@ -0,0 +1,87 @@
+import os
+import time
+import click
+from . import db
+
+
+def register_commands(app):
+    """Attach the maintenance commands to the `flask` CLI"""
+
+    @app.cli.command('recount-comments')
+    def recount_comments():
+        """Rebuild Post.comment_count from the comments table."""
+        from .models import Post
+        from .pool import statement_timeout_disabled
+        # One table-wide UPDATE, far longer than a request's statement
+        with statement_timeout_disabled(db.session.connection()):
+            updated = Post.recount_comments()
+        db.session.commit()
+        click.echo(f"Recounted comments for {updated} posts")
+
+    @app.cli.command('reindex-posts')
+    def reindex_posts():
+        """Rebuild the full-text search index for all posts."""
+        from .pool import statement_timeout_disabled
+        from .search import reindex_all
+        with statement_timeout_disabled(db.session.connection()):
+            indexed = reindex_all()
+        db.session.commit()
+        click.echo(f"Indexed {indexed} posts")
+
+    @app.cli.command('check-query-plans')
+    def check_query_plans():
+        """EXPLAIN the hot endpoint queries; exit 1 if one does a full scan."""
+        from .query_plans import check_query_plans as run_checks
+        failed = False
+        for name, scans, plan in run_checks():
+            if scans:
+                failed = True
+                click.echo(f"FAIL {name}: {', '.join(scans)}")
+                for line in plan:
+                    click.echo(f"    {line}")
+            else:
+                click.echo(f"ok   {name}")
+        if failed:
+            raise SystemExit(1)
+
+    @app.cli.command('precompress-frontend')
+    def precompress_frontend():
+        """Write .br/.gz variants of the frontend build for the app to serve."""
+        from .frontend import precompress
+        written = 0
+        for path, encoding, size, compressed in precompress(app.static_folder):
+            written += 1
+            click.echo(f"{os.path.relpath(path, app.static_folder)} ({encoding}): {size} -> {compressed} bytes")
+        click.echo(f"Wrote {written} compressed files")
+
+    @app.cli.command('generate-data')
+    @click.option('--users', default=1000, show_default=True, help='Users to create.')
+    @click.option('--posts', default=10000, show_default=True, help='Posts to create.')
+    @click.option('--comments', default=100000, show_default=True, help='Comments to create.')
+    @click.option('--batch-size', default=10000, show_default=True, help='Rows per insert batch.')
+    @click.option('--seed', type=int, help='Random seed for a reproducible dataset.')
+    def generate_data(users, posts, comments, batch_size, seed):
+        """Bulk-load synthetic users, posts and comments for load testing.
+
+        Rows are appended to whatever is already in the database. Every
+        generated user has the password "password".
+        """
+        from .datagen import generate_data as generate
+        from .hashing import password_hasher
+        from .pool import statement_timeout_disabled
+        from .search import reindex_all
+        
+        if users < 1:
+            raise click.BadParameter('at least one user is required', param_hint='--users')
+        if comments and not posts:
+            raise click.BadParameter('comments need posts to belong to', param_hint='--posts')
+        
+        started = time.perf_counter()
+        with db.engine.connect() as conn, statement_timeout_disabled(conn):
+            generate(conn, users, posts, comments,
+                     password_hash=password_hasher().hash('password'),
+                     batch_size=batch_size, seed=seed, echo=click.echo)
+            click.echo("Rebuilding the search index...")
+            reindex_all(conn)
+            conn.commit()
+        click.echo(f"Done in {time.perf_counter() - started:.1f}s")
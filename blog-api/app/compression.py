@@ -0,0 +1,146 @@
+"""Negotiated compression of API responses.
+
+JSON and text responses of at least COMPRESS_MIN_SIZE bytes are encoded
+with the best algorithm in COMPRESS_ALGORITHMS that the client accepts.
+gzip is always available; br needs the brotli package and zstd the
+zstandard package. Streamed responses are compressed chunk by chunk and
+flushed after each one, so clients still receive data as it is produced.
+Responses that are 304s, partial, already encoded or of other types are
+left alone.
+"""
+import zlib
+from flask import request
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+SKIPPED_STATUSES = (204, 206, 304)
+
+
+class _Gzip:
+    def __init__(self, level):
+        self._stream = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._stream.compress(data)
+
+    def sync(self):
+        return self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._stream.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        import brotli
+        self._stream = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._stream.process(data)
+
+    def sync(self):
+        return self._stream.flush()
+
+    def finish(self):
+        return self._stream.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        import zstandard
+        self._flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        self._stream = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._stream.compress(data)
+
+    def sync(self):
+        return self._stream.flush(self._flush_block)
+
+    def finish(self):
+        return self._stream.flush()
+
+
+def _installed(module):
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def available_codecs(config):
+    """encoding -> factory for a fresh compressor, for the installed algorithms"""
+    codecs = {'gzip': lambda: _Gzip(config['COMPRESS_GZIP_LEVEL'])}
+    if _installed('brotli'):
+        codecs['br'] = lambda: _Brotli(config['COMPRESS_BROTLI_QUALITY'])
+    if _installed('zstandard'):
+        codecs['zstd'] = lambda: _Zstd(config['COMPRESS_ZSTD_LEVEL'])
+    return codecs
+
+
+def negotiate(preference, accept_encodings):
+    """The accepted encoding with the highest quality; ties go to the first in preference"""
+    best, best_quality = None, 0
+    for encoding in preference:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compress_stream(chunks, codec, close):
+    try:
+        for chunk in chunks:
+            data = codec.compress(chunk) + codec.sync()
+            if data:
+                yield data
+        yield codec.finish()
+    finally:
+        if close is not None:
+            close()
+
+
+def init_compression(app):
+    codecs = available_codecs(app.config)
+    preference = [name.strip() for name in app.config['COMPRESS_ALGORITHMS'].split(',')
+                  if name.strip() in codecs]
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    if not preference:
+        return
+
+    @app.after_request
+    def _compress(response):
+        if (request.method == 'HEAD'
+                or response.status_code < 200 or response.status_code in SKIPPED_STATUSES
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+                or response.cache_control.no_transform):
+            return response
+
+        # The body depends on Accept-Encoding whether or not this one is compressed
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(preference, request.accept_encodings)
+        if encoding is None:
+            return response
+
+        codec = codecs[encoding]()
+        if response.is_streamed:
+            chunks = response.iter_encoded()
+            response.response = _compress_stream(chunks, codec, getattr(response.response, 'close', None))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            compressed = codec.compress(data) + codec.finish()
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        # A strong validator must differ between encodings; weak ones may not
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{encoding}')
+        return response
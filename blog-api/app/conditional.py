@@ -0,0 +1,34 @@
+import hashlib
+from flask import make_response, request
+
+# Responses are per-user (they need a token), so only the client may keep
+# them, and it has to revalidate with the ETag before reusing one
+CACHE_CONTROL = 'private, no-cache'
+
+# Only ETags are offered. A Last-Modified taken from updated_at would not
+# move when a post is deleted or commented on, and has second precision,
+# so If-Modified-Since could answer 304 over a changed body.
+
+
+def make_etag(*parts):
+    """Build an ETag value from the parts that determine a response body"""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def not_modified(etag):
+    """Return a 304 response if the request's If-None-Match still matches, else None.
+
+    Called before the response body is built so an unchanged resource
+    costs only the validator query.
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    return add_validators(('', 304), etag)
+
+
+def add_validators(rv, etag):
+    """Attach ETag and Cache-Control to a view's return value"""
+    response = make_response(rv)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
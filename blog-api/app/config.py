@@ -6,3 +6,65 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.getenv("SECRET_KEY", "devsecret")
+    
+    # Optional read replica for GET requests; a user's reads stay on the
+    # primary for READ_YOUR_WRITES_SECONDS after they write. With several
+    # workers the pins need the shared RESPONSE_CACHE_URL backend
+    REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+    READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 5))
+    
+    # Per-process cache of authenticated principals used by token_required
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+    PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", 60))
+    
+    # Sign username/role into tokens and authorize from the claims alone;
+    # revocation is checked against a cached map of user token versions
+    JWT_STATELESS = os.getenv("JWT_STATELESS", "false").lower() in ("1", "true", "yes")
+    TOKEN_VERSION_CACHE_SIZE = int(os.getenv("TOKEN_VERSION_CACHE_SIZE", 100000))
+    TOKEN_VERSION_CACHE_TTL = int(os.getenv("TOKEN_VERSION_CACHE_TTL", 30))
+    
+    # Password hashing: cost, how many hashes may run at once on the host
+    # (shared by all Gunicorn workers), how many more may wait and for how
+    # many seconds before /register and /login answer 503
+    PASSWORD_HASH_ITERATIONS = int(os.getenv("PASSWORD_HASH_ITERATIONS", 600000))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 32))
+    PASSWORD_HASH_WAIT_TIMEOUT = float(os.getenv("PASSWORD_HASH_WAIT_TIMEOUT", 5))
+    PASSWORD_HASH_RETRY_AFTER = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))
+    
+    # Cache of published post responses; in-process unless RESPONSE_CACHE_URL
+    # points at a shared Redis server
+    RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL")
+    RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2048))
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+    
+    # Connection pool (ignored for in-memory SQLite) and per-statement timeout;
+    # the maintenance commands lift the timeout for their own statements
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+    DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 5000))
+    
+    # JSON encoder for responses: orjson, stdlib, or auto (orjson if installed)
+    JSON_PROVIDER = os.getenv("JSON_PROVIDER", "auto")
+    
+    # Response compression: encodings in order of preference (br needs
+    # brotli, zstd needs zstandard; empty disables), smallest body compressed
+    # and the level of each algorithm
+    COMPRESS_ALGORITHMS = os.getenv("COMPRESS_ALGORITHMS", "zstd,br,gzip")
+    COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", 500))
+    COMPRESS_GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", 6))
+    COMPRESS_BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", 4))
+    COMPRESS_ZSTD_LEVEL = int(os.getenv("COMPRESS_ZSTD_LEVEL", 3))
+    
+    # Per-request SQL instrumentation: a JSON log line per request, and a
+    # warning when one statement shape repeats more than the threshold
+    REQUEST_LOG = os.getenv("REQUEST_LOG", "true").lower() in ("1", "true", "yes")
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", 10))
+    
+    # /metrics: with several worker processes, point METRICS_DIR at a
+    # directory they share (emptied on deploy) so the totals cover all of them
+    METRICS_DIR = os.getenv("METRICS_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1.0))
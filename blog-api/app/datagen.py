@@ -0,0 +1,178 @@
+import csv
+import io
+import math
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from .models import User, Post, Comment, Generation
+
+WORDS = (
+    'the of and to in is that for it as was with be by on not he this are or '
+    'his from at which but have an they you were her she there one all we '
+    'their been has would when if more will no out so said what up its about '
+    'into than them can only other new some could time these two may then do '
+    'first any my now such like our over man me even most made after also '
+    'flask python query index cache latency database request server blog post '
+    'comment author reader design deploy release testing performance memory'
+).split()
+
+
+def _corpus(rng, size=1 << 20):
+    """A block of random words that rows take slices of, far cheaper than
+    generating every text field word by word"""
+    words = rng.choices(WORDS, k=size // 5)
+    return ' '.join(words)
+
+
+def _text(rng, corpus, median, sigma, low, high):
+    # Lengths follow a log-normal distribution, clipped to [low, high]
+    length = int(min(high, max(low, rng.lognormvariate(math.log(median), sigma))))
+    start = rng.randrange(0, len(corpus) - length)
+    return corpus[start:start + length].strip() or 'text'
+
+
+def _next_id(conn, model):
+    return (conn.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+
+def _copy(conn, table, columns, rows):
+    """Load rows with COPY ... FROM STDIN (PostgreSQL with psycopg2)"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buf.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf
+        )
+    finally:
+        cursor.close()
+
+
+def _insert_many(conn, table, columns, rows):
+    """Load rows with one executemany INSERT"""
+    conn.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def bulk_load(conn, table, columns, rows, total, batch_size, echo):
+    """Insert the rows iterable in batches, committing and reporting after each"""
+    use_copy = conn.dialect.name == 'postgresql' and conn.dialect.driver == 'psycopg2'
+    load = _copy if use_copy else _insert_many
+    started = time.perf_counter()
+    done = 0
+    batch = []
+
+    def flush():
+        nonlocal done
+        load(conn, table, columns, batch)
+        conn.commit()
+        done += len(batch)
+        elapsed = time.perf_counter() - started
+        echo(f"  {table.name}: {done}/{total} rows ({done / elapsed:,.0f} rows/s)")
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+
+
+def _fix_sequence(conn, table):
+    # COPY with explicit ids does not advance the serial sequence
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f"(SELECT coalesce(max(id), 1) FROM {table}))"
+        )
+        conn.commit()
+
+
+def generate_data(conn, users, posts, comments, password_hash, batch_size=10000,
+                  seed=None, echo=print):
+    """Append users, posts and comments with realistic sizes to the database.
+
+    Post bodies and comments have log-normal lengths, comments are spread
+    over published posts with a heavy-tailed (Pareto) popularity, and
+    timestamps fall within the past year. Post.comment_count is filled in
+    directly. The caller rebuilds the search index afterwards.
+    """
+    rng = random.Random(seed)
+    corpus = _corpus(rng)
+    now = datetime.utcnow()
+    window = timedelta(days=365).total_seconds()
+    epoch = now.timestamp() - window
+
+    first_user = _next_id(conn, User)
+    first_post = _next_id(conn, Post)
+    first_comment = _next_id(conn, Comment)
+
+    # Users: about 1% admins and 20% authors; everyone shares one password
+    roles = rng.choices(['user', 'author', 'admin'], weights=[79, 20, 1], k=users)
+    if 'author' not in roles and 'admin' not in roles:
+        roles[0] = 'author'
+    author_ids = [first_user + i for i, role in enumerate(roles) if role != 'user']
+
+    def user_rows():
+        for i, role in enumerate(roles):
+            user_id = first_user + i
+            yield (user_id, f'user{user_id}', f'user{user_id}@example.com', password_hash,
+                   role, 0, datetime.fromtimestamp(epoch + window * i / max(users, 1)))
+
+    echo(f"Generating {users} users, {posts} posts, {comments} comments")
+    bulk_load(conn, User.__table__,
+              ['id', 'username', 'email', 'password_hash', 'role', 'token_version', 'created_at'],
+              user_rows(), users, batch_size, echo)
+
+    # Decide up front which posts are published, when they were written and
+    # how many comments each one gets, so comment_count is exact
+    published = [rng.random() < 0.85 for _ in range(posts)]
+    created = array('d', sorted(epoch + rng.random() * window for _ in range(posts)))
+    weights = [rng.paretovariate(1.2) if published[i] else 0.0 for i in range(posts)]
+    weight_total = sum(weights) or 1.0
+    counts = array('I', (int(comments * w / weight_total) for w in weights))
+    leftover = comments - sum(counts)
+    eligible = [i for i in range(posts) if published[i]]
+    for i in (rng.choices(eligible, k=leftover) if eligible and leftover > 0 else []):
+        counts[i] += 1
+
+    def post_rows():
+        for i in range(posts):
+            post_id = first_post + i
+            created_at = datetime.fromtimestamp(created[i])
+            updated_at = created_at + timedelta(seconds=rng.random() * (now - created_at).total_seconds() * 0.1)
+            yield (post_id, _text(rng, corpus, 45, 0.4, 8, 250).capitalize(), f'post-{post_id}',
+                   _text(rng, corpus, 2500, 0.9, 100, 50000), published[i],
+                   rng.choice(author_ids), created_at, updated_at, counts[i])
+
+    bulk_load(conn, Post.__table__,
+              ['id', 'title', 'slug', 'content', 'published', 'author_id',
+               'created_at', 'updated_at', 'comment_count'],
+              post_rows(), posts, batch_size, echo)
+
+    def comment_rows():
+        comment_id = first_comment
+        for i in range(posts):
+            post_created = created[i]
+            for _ in range(counts[i]):
+                created_at = datetime.fromtimestamp(
+                    post_created + rng.random() * (now.timestamp() - post_created)
+                )
+                yield (comment_id, _text(rng, corpus, 200, 1.0, 5, 5000), created_at, created_at,
+                       first_user + rng.randrange(users),
+                       first_post + i)
+                comment_id += 1
+
+    bulk_load(conn, Comment.__table__,
+              ['id', 'content', 'created_at', 'updated_at', 'user_id', 'post_id'],
+              comment_rows(), comments, batch_size, echo)
+
+    for table in ('users', 'posts', 'comments'):
+        _fix_sequence(conn, table)
+    # The bulk load bypasses the ORM flush that normally moves this
+    Generation.bump(conn, Generation.POSTS)
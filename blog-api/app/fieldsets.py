@@ -0,0 +1,85 @@
+"""Sparse fieldsets: ?fields=title,slug limits a response to those fields.
+
+A FieldSet lists the fields of one resource and the columns behind each,
+so the query selects only what the requested fields need and joins a
+related table only when a requested field comes from it. Without
+?fields= every field is returned, as before.
+"""
+from flask import request
+from . import db
+
+
+class InvalidFields(ValueError):
+    """Raised when ?fields= names a field the resource does not have"""
+
+
+class Field:
+    """One response field: the columns it needs, how to render it from a
+    result row, and the FieldSet join it depends on, if any.
+
+    A field without columns is filled in by the view (e.g. embedded comments).
+    """
+
+    def __init__(self, *columns, render=None, join=None):
+        self.columns = columns
+        self.render = render
+        self.join = join
+
+
+class FieldSet:
+    def __init__(self, entity, fields, required=(), joins=None):
+        self.entity = entity
+        self.fields = fields
+        # Columns every query needs whatever is requested, e.g. paging keys
+        self.required = required
+        # join name -> function adding that join to a query
+        self.joins = joins or {}
+
+    def parse(self):
+        """Field names requested by ?fields=, or None for all of them"""
+        value = request.args.get('fields')
+        if value is None:
+            return None
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = sorted(names - self.fields.keys())
+        if unknown:
+            raise InvalidFields(f"Unknown fields: {', '.join(unknown)}")
+        if not names:
+            raise InvalidFields('No fields requested')
+        # Declaration order, so equal requests share cache keys and ETags
+        return tuple(name for name in self.fields if name in names)
+
+    def key(self, names):
+        return 'all' if names is None else ','.join(names)
+
+    def wants(self, names, name):
+        return names is None or name in names
+
+    def selected(self, names):
+        return [(name, field) for name, field in self.fields.items() if self.wants(names, name)]
+
+    def query(self, names):
+        """A query selecting just the columns the requested fields need"""
+        columns = {}
+        joins = []
+        for column in self.required:
+            columns.setdefault(column.key, column)
+        for name, field in self.selected(names):
+            for column in field.columns:
+                columns.setdefault(column.key, column)
+            if field.join and field.join not in joins:
+                joins.append(field.join)
+
+        query = db.session.query(*columns.values()).select_from(self.entity)
+        for join in joins:
+            query = self.joins[join](query)
+        return query
+
+    def render(self, row, names):
+        data = {}
+        for name, field in self.selected(names):
+            if field.render is not None:
+                data[name] = field.render(row)
+            elif field.columns:
+                data[name] = getattr(row, field.columns[0].key)
+        return data
@@ -0,0 +1,175 @@
+"""Serving the built React frontend.
+
+The build directory is scanned once into a manifest, so requests never
+touch the filesystem to find a file. Precompressed .br/.gz siblings
+(written at build time or by `flask precompress-frontend`) are served
+when the client accepts them. Files with a content hash in their name are
+cached for a year as immutable; everything else revalidates by ETag.
+index.html, which every SPA route falls back to, is held in memory.
+
+The manifest reflects the build at startup; restart after deploying a
+new frontend build. init_frontend registers the routes on every app
+create_app builds, so Gunicorn (wsgi:app) serves the frontend too.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from collections import namedtuple
+from flask import abort, current_app, request, send_file
+
+# Bundles named like main.3f4a1b2c.js or 453.8e1a2b3c.chunk.css
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Preferred first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml',
+                      'application/manifest+json')
+
+Asset = namedtuple('Asset', 'path mimetype etag hashed variants')
+
+
+def compressible(mimetype):
+    return mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding):
+    """data compressed with encoding ('br' needs the brotli package)"""
+    if encoding == 'gzip':
+        return gzip.compress(data, 9)
+    import brotli
+    return brotli.compress(data, quality=11)
+
+
+def available_encodings():
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        return ['gzip']
+    return ['br', 'gzip']
+
+
+class FrontendAssets:
+    def __init__(self, directory, index='index.html'):
+        self.directory = directory
+        self.assets = self._scan()
+        self.index = None
+        self.index_variants = {}
+        if index in self.assets:
+            with open(self.assets[index].path, 'rb') as f:
+                self.index = f.read()
+            self.index_etag = hashlib.sha1(self.index).hexdigest()
+            self.index_variants = {encoding: compress(self.index, encoding)
+                                   for encoding in available_encodings()}
+
+    def _scan(self):
+        assets = {}
+        if not self.directory or not os.path.isdir(self.directory):
+            return assets
+        for root, dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                variants = {encoding: path + suffix for encoding, suffix in ENCODINGS
+                            if os.path.isfile(path + suffix)}
+                key = os.path.relpath(path, self.directory).replace(os.sep, '/')
+                assets[key] = Asset(
+                    path,
+                    mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                    f'{stat.st_mtime_ns:x}-{stat.st_size:x}',
+                    bool(HASHED_NAME.search(name)),
+                    variants
+                )
+        return assets
+
+    def _negotiate(self, encodings):
+        for encoding, _ in ENCODINGS:
+            if encoding in encodings and request.accept_encodings[encoding]:
+                return encoding
+        return None
+
+    def serve(self, path):
+        """The asset at path, or index.html for any other SPA route"""
+        asset = self.assets.get(path)
+        if asset is None or path == 'index.html':
+            return self.serve_index()
+
+        encoding = self._negotiate(asset.variants)
+        response = send_file(
+            asset.variants[encoding] if encoding else asset.path,
+            mimetype=asset.mimetype,
+            etag=f'{asset.etag}-{encoding}' if encoding else asset.etag,
+            conditional=True,
+            max_age=IMMUTABLE_MAX_AGE if asset.hashed else None
+        )
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+
+        if asset.hashed:
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return response
+
+    def serve_index(self):
+        if self.index is None:
+            abort(404)
+        encoding = self._negotiate(self.index_variants)
+        response = current_app.response_class(
+            self.index_variants[encoding] if encoding else self.index, mimetype='text/html'
+        )
+        response.set_etag(f'{self.index_etag}-{encoding}' if encoding else self.index_etag)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        # Always revalidated, so a new deploy is picked up on the next load
+        response.cache_control.no_cache = True
+        return response.make_conditional(request)
+
+
+def init_frontend(app):
+    frontend = FrontendAssets(app.static_folder)
+
+    def serve_react(path=''):
+        # Unknown API paths stay 404s rather than becoming the SPA shell
+        if path == 'api' or path.startswith('api/'):
+            abort(404)
+        return frontend.serve(path)
+
+    app.add_url_rule('/', 'serve_react', serve_react)
+    app.add_url_rule('/<path:path>', 'serve_react', serve_react)
+    # The React build keeps its hashed bundles in its own static/ folder,
+    # which Flask's static route would look for one level up
+    app.view_functions['static'] = lambda filename: serve_react(f'static/{filename}')
+
+
+def precompress(directory, min_size=1024):
+    """Write .gz (and .br with brotli installed) next to compressible files.
+
+    Yields (path, encoding, original size, compressed size) for each
+    variant written; variants that would not be smaller are skipped.
+    """
+    encodings = available_encodings()
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if name.endswith(tuple(suffix for _, suffix in ENCODINGS)):
+                continue
+            mimetype = mimetypes.guess_type(name)[0] or ''
+            path = os.path.join(root, name)
+            if not compressible(mimetype) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for encoding in encodings:
+                compressed = compress(data, encoding)
+                if len(compressed) < len(data):
+                    with open(path + dict(ENCODINGS)[encoding], 'wb') as f:
+                        f.write(compressed)
+                    yield path, encoding, len(data), len(compressed)
@@ -0,0 +1,57 @@
+import multiprocessing
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the password hashing queue is full"""
+
+
+class PasswordHasher:
+    """Bounds password hashing across every worker process on the host.
+
+    pbkdf2 releases the GIL while it works, so at most `workers` hashes run
+    at once, each in the request thread that asked for it. At most
+    workers + queue_size may be running or waiting; anything beyond that
+    is refused with HasherBusy instead of piling up, and so is a hash that
+    waits longer than wait_timeout seconds to start.
+
+    The limits are process-shared semaphores. Gunicorn preloads the app, so
+    they are created once in the master and every forked worker counts
+    against the same limits. A worker that dies while hashing or waiting
+    never returns its permits; the wait timeout turns such leaks into 503s
+    rather than request threads blocked for good.
+    """
+
+    def __init__(self, workers, queue_size, iterations, wait_timeout=5.0):
+        self.method = f'pbkdf2:sha256:{iterations}'
+        self.wait_timeout = wait_timeout
+        self._running = multiprocessing.BoundedSemaphore(workers)
+        self._slots = multiprocessing.BoundedSemaphore(workers + queue_size)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(block=False):
+            raise HasherBusy('Password hashing queue is full')
+        try:
+            if not self._running.acquire(timeout=self.wait_timeout):
+                raise HasherBusy('Timed out waiting to hash a password')
+            try:
+                return fn(*args)
+            finally:
+                self._running.release()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different method or cost"""
+        return password_hash.partition('$')[0] != self.method
+
+
+def password_hasher():
+    return current_app.extensions['password_hasher']
@@ -0,0 +1,104 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger('bloghub.requests')
+
+# Literals are dropped so statements differing only in values share a shape
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)')
+
+
+def statement_shape(statement):
+    shape = _LITERALS.sub('?', statement)
+    shape = _IN_LISTS.sub('(?)', shape)
+    return ' '.join(shape.split())
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    if not has_request_context():
+        return
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    stats = g.get('sql_stats')
+    if stats is None:
+        stats = g.sql_stats = {'count': 0, 'time': 0.0, 'shapes': Counter()}
+    stats['count'] += 1
+    stats['time'] += elapsed
+    stats['shapes'][statement_shape(statement)] += 1
+
+
+def instrument_engine(engine):
+    event.listen(engine, 'before_cursor_execute', _before_execute)
+    event.listen(engine, 'after_cursor_execute', _after_execute)
+
+
+def init_instrumentation(app, db):
+    """Count and time SQL per request, and report it in Server-Timing and the log.
+
+    A statement shape repeated more than SQL_N_PLUS_ONE_THRESHOLD times in
+    one request is logged as a likely N+1 query.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+    
+    if app.config['REQUEST_LOG'] and not logger.handlers:
+        # One JSON object per line, ready for log shippers
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def _report(response):
+        start = g.get('request_start')
+        if start is None:
+            return response
+        total_ms = (time.perf_counter() - start) * 1000
+        stats = g.get('sql_stats') or {'count': 0, 'time': 0.0, 'shapes': Counter()}
+        db_ms = stats['time'] * 1000
+
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={db_ms:.2f};desc="{stats["count"]} queries", app;dur={total_ms:.2f}'
+        )
+
+        threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        repeated = [(shape, n) for shape, n in stats['shapes'].items() if n > threshold]
+        if app.config['REQUEST_LOG']:
+            logger.info(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(total_ms, 2),
+                'db_queries': stats['count'],
+                'db_ms': round(db_ms, 2),
+            }))
+        for shape, n in repeated:
+            logger.warning(json.dumps({
+                'event': 'n_plus_one',
+                'method': request.method,
+                'endpoint': request.endpoint,
+                'repeats': n,
+                'statement': shape[:500],
+            }))
+        return response
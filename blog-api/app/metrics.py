@@ -0,0 +1,300 @@
+import bisect
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from flask import current_app, g, request
+
+# Latency histogram bucket bounds in seconds (+Inf is implied)
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Counters of every worker that has exited, in snapshot form
+EXITED_FILE = 'exited-workers.json'
+
+
+class Metrics:
+    """Request metrics for one worker process.
+
+    Updates only touch in-memory counters under a lock. When METRICS_DIR is
+    set, each worker also writes a snapshot to <dir>/worker-<pid>.json at
+    most every METRICS_FLUSH_INTERVAL seconds, and /metrics adds up the
+    snapshots of every worker. When a collect finds the snapshot of a worker
+    that has exited, its counters are folded into EXITED_FILE and the
+    snapshot is deleted, so totals never go backwards and recycled workers
+    do not pile up files; their gauges are dropped.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._durations = {}
+        self._in_flight = 0
+        self._last_flush = 0.0
+
+    def start(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def finish(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def observe(self, endpoint, method, status, seconds):
+        with self._lock:
+            key = (endpoint, method, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            histogram = self._durations.get(endpoint)
+            if histogram is None:
+                histogram = self._durations[endpoint] = {
+                    'buckets': [0] * (len(BUCKETS) + 1), 'sum': 0.0, 'count': 0
+                }
+            histogram['buckets'][bisect.bisect_left(BUCKETS, seconds)] += 1
+            histogram['sum'] += seconds
+            histogram['count'] += 1
+
+    def snapshot(self, gauges, cache_counters):
+        """This worker's metrics as a JSON-serializable dict"""
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'requests': [list(key) + [count] for key, count in self._requests.items()],
+                'durations': {endpoint: {'buckets': list(h['buckets']), 'sum': h['sum'], 'count': h['count']}
+                              for endpoint, h in self._durations.items()},
+                'in_flight': self._in_flight,
+                'gauges': gauges,
+                'caches': cache_counters,
+            }
+
+    def maybe_flush(self, snapshot_fn, force=False):
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < self.flush_interval:
+            return
+        self._last_flush = now
+        data = snapshot_fn()
+        self._write(os.path.join(self.directory, f"worker-{data['pid']}.json"), data)
+
+    def _write(self, path, data):
+        # Write then rename so readers never see a partial file
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.worker-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def _read(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def collect(self, snapshot_fn):
+        """Snapshots of all workers (just this one without METRICS_DIR)"""
+        if not self.directory:
+            return [snapshot_fn()]
+        self.maybe_flush(snapshot_fn, force=True)
+        
+        # One collector at a time, so an exited worker is folded in exactly
+        # once and no reader sees it both folded and still on disk
+        with open(os.path.join(self.directory, '.collect.lock'), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            exited_path = os.path.join(self.directory, EXITED_FILE)
+            exited = self._read(exited_path) or {
+                'pid': None, 'requests': [], 'durations': {}, 'in_flight': 0, 'gauges': {}, 'caches': {}
+            }
+            snapshots, folded = [], []
+            for path in glob.glob(os.path.join(self.directory, 'worker-*.json')):
+                snap = self._read(path)
+                if snap is None:
+                    continue
+                if snap['pid'] == os.getpid() or _alive(snap['pid']):
+                    snapshots.append(snap)
+                else:
+                    _fold_counters(exited, snap)
+                    folded.append(path)
+            if folded:
+                self._write(exited_path, exited)
+                for path in folded:
+                    os.remove(path)
+        return snapshots + [exited]
+
+
+def _fold_counters(total, snap):
+    """Add the counters of snap into total, both in snapshot form"""
+    requests = {tuple(row[:3]): row[3] for row in total['requests']}
+    for endpoint, method, status, count in snap['requests']:
+        requests[(endpoint, method, status)] = requests.get((endpoint, method, status), 0) + count
+    total['requests'] = [list(key) + [count] for key, count in requests.items()]
+    for endpoint, h in snap['durations'].items():
+        merged = total['durations'].setdefault(endpoint, {'buckets': [0] * len(h['buckets']), 'sum': 0.0, 'count': 0})
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], h['buckets'])]
+        merged['sum'] += h['sum']
+        merged['count'] += h['count']
+    for cache, counts in snap['caches'].items():
+        merged = total['caches'].setdefault(cache, {'hits': 0, 'misses': 0})
+        merged['hits'] += counts['hits']
+        merged['misses'] += counts['misses']
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                          for k, v in labels.items()) + '}'
+
+
+def render(snapshots):
+    """Merge worker snapshots into the Prometheus text exposition format"""
+    requests, durations, gauges, caches = {}, {}, {}, {}
+    in_flight = 0
+    for snap in snapshots:
+        for endpoint, method, status, count in snap['requests']:
+            key = (endpoint, method, status)
+            requests[key] = requests.get(key, 0) + count
+        for endpoint, h in snap['durations'].items():
+            merged = durations.setdefault(endpoint, {'buckets': [0] * len(h['buckets']), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], h['buckets'])]
+            merged['sum'] += h['sum']
+            merged['count'] += h['count']
+        for cache, counts in snap['caches'].items():
+            merged = caches.setdefault(cache, {'hits': 0, 'misses': 0})
+            merged['hits'] += counts['hits']
+            merged['misses'] += counts['misses']
+        # The exited-workers total has no pid and no gauges
+        if snap['pid'] is not None and (snap['pid'] == os.getpid() or _alive(snap['pid'])):
+            in_flight += snap['in_flight']
+            for name, series in snap['gauges'].items():
+                for labels, value in series:
+                    key = (name, tuple(sorted(labels.items())))
+                    gauges[key] = gauges.get(key, 0) + value
+
+    lines = [
+        '# HELP bloghub_http_requests_total Requests handled, by endpoint, method and status.',
+        '# TYPE bloghub_http_requests_total counter',
+    ]
+    for (endpoint, method, status), count in sorted(requests.items()):
+        lines.append(f'bloghub_http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+    lines += [
+        '# HELP bloghub_http_request_duration_seconds Request latency by endpoint.',
+        '# TYPE bloghub_http_request_duration_seconds histogram',
+    ]
+    for endpoint, h in sorted(durations.items()):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), h['buckets']):
+            cumulative += count
+            lines.append(f'bloghub_http_request_duration_seconds_bucket{_labels(endpoint=endpoint, le=bound)} {cumulative}')
+        lines.append(f'bloghub_http_request_duration_seconds_sum{_labels(endpoint=endpoint)} {h["sum"]}')
+        lines.append(f'bloghub_http_request_duration_seconds_count{_labels(endpoint=endpoint)} {h["count"]}')
+
+    lines += [
+        '# HELP bloghub_http_requests_in_progress Requests being handled right now.',
+        '# TYPE bloghub_http_requests_in_progress gauge',
+        f'bloghub_http_requests_in_progress {in_flight}',
+    ]
+
+    names = sorted({name for name, _ in gauges})
+    for name in names:
+        lines.append(f'# TYPE {name} gauge')
+        for (gauge, labels), value in sorted(gauges.items()):
+            if gauge == name:
+                lines.append(f'{name}{_labels(**dict(labels))} {value}')
+
+    lines += [
+        '# HELP bloghub_cache_requests_total Cache lookups by cache and result.',
+        '# TYPE bloghub_cache_requests_total counter',
+    ]
+    for cache, counts in sorted(caches.items()):
+        lines.append(f'bloghub_cache_requests_total{_labels(cache=cache, result="hit")} {counts["hits"]}')
+        lines.append(f'bloghub_cache_requests_total{_labels(cache=cache, result="miss")} {counts["misses"]}')
+    lines += [
+        '# HELP bloghub_cache_hit_ratio Share of cache lookups that were hits.',
+        '# TYPE bloghub_cache_hit_ratio gauge',
+    ]
+    for cache, counts in sorted(caches.items()):
+        lookups = counts['hits'] + counts['misses']
+        ratio = counts['hits'] / lookups if lookups else 0
+        lines.append(f'bloghub_cache_hit_ratio{_labels(cache=cache)} {ratio}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def _worker_snapshot():
+    from . import db
+    from .pool import pool_status
+
+    # Pool gauges per bind: None is the primary
+    gauges = {}
+    for bind, engine in db.engines.items():
+        status = pool_status(engine)
+        labels = {'bind': bind or 'primary'}
+        for field in ('checked_out', 'idle', 'overflow'):
+            if field in status:
+                gauges.setdefault(f'bloghub_db_pool_{field}', []).append((labels, status[field]))
+        if 'wait_max_ms' in status:
+            gauges.setdefault('bloghub_db_pool_checkout_wait_max_seconds', []).append(
+                (labels, status['wait_max_ms'] / 1000))
+
+    extensions = current_app.extensions
+    caches = {}
+    for name, cache in (('principal', extensions['principal_cache']),
+                        ('token_version', extensions['token_version_cache']),
+                        ('response', extensions['response_cache'])):
+        caches[name] = {'hits': cache.hits, 'misses': cache.misses}
+
+    return current_app.extensions['metrics'].snapshot(gauges, caches)
+
+
+def flush_metrics(app):
+    """Write this worker's snapshot now; Gunicorn's worker_exit calls it so
+    the requests served since the last periodic flush are not lost"""
+    with app.app_context():
+        app.extensions['metrics'].maybe_flush(_worker_snapshot, force=True)
+
+
+def init_metrics(app):
+    """Record per-request metrics and serve them at /metrics"""
+    directory = app.config['METRICS_DIR']
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    metrics = app.extensions['metrics'] = Metrics(directory, app.config['METRICS_FLUSH_INTERVAL'])
+
+    @app.before_request
+    def _metrics_start():
+        g.metrics_start = time.perf_counter()
+        metrics.start()
+
+    @app.after_request
+    def _metrics_observe(response):
+        start = g.get('metrics_start')
+        if start is not None:
+            metrics.observe(request.endpoint or 'unmatched', request.method,
+                            response.status_code, time.perf_counter() - start)
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(exc):
+        if g.pop('metrics_start', None) is not None:
+            metrics.finish()
+            # Flushed after finish() so the snapshot's in-flight count is current
+            metrics.maybe_flush(_worker_snapshot)
+
+    def metrics_view():
+        body = render(metrics.collect(_worker_snapshot))
+        return body, 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
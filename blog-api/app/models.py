@@ -101,10 +101,10 @@
 
 from . import db
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from .hashing import password_hasher
 
-class User(db.Model):
-    __tablename__ = 'users'
+class RoleMixin:
+    """Role helpers shared by User and the cached auth principal"""
     
     # Role hierarchy
     ROLES = {
@@ -113,23 +113,46 @@ class User(db.Model):
         'user': 1
     }
     
+    def has_role(self, role_name):
+        """Check if user has the specified role"""
+        return self.ROLES.get(self.role, 0) >= self.ROLES.get(role_name, 0)
+    
+    def is_admin(self):
+        return self.has_role('admin')
+    
+    def is_author(self):
+        return self.has_role('author') or self.is_admin()
+
+
+class User(RoleMixin, db.Model):
+    __tablename__ = 'users'
+    __table_args__ = (
+        # Admin user listing, paged on (created_at, id)
+        db.Index('ix_users_created_at_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     email = db.Column(db.String(255), unique=True, nullable=False)
     password_hash = db.Column(db.Text, nullable=False)
     role = db.Column(db.String(20), default='user', nullable=False)
+    # Bumped to revoke every token issued before the bump
+    token_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
     posts = db.relationship('Post', backref='author', lazy=True, cascade='all, delete-orphan')
     comments = db.relationship('Comment', backref='author', lazy=True, cascade='all, delete-orphan')
     
-    # Password helpers
+    # Password helpers (both may raise HasherBusy when hashing is saturated)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = password_hasher().hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher().verify(self.password_hash, password)
+    
+    def password_needs_rehash(self):
+        return password_hasher().needs_rehash(self.password_hash)
     
     # Auth token helpers
     def generate_auth_token(self, expires_in=3600):
@@ -137,11 +160,20 @@ class User(db.Model):
         import jwt
         from flask import current_app
         from datetime import datetime, timedelta
-        return jwt.encode(
-            {'user_id': self.id, 'exp': datetime.utcnow() + timedelta(seconds=expires_in)},
-            current_app.config['SECRET_KEY'],
-            algorithm='HS256'
-        )
+        claims = {
+            'user_id': self.id,
+            'ver': self.token_version or 0,
+            'exp': datetime.utcnow() + timedelta(seconds=expires_in)
+        }
+        # In stateless mode the token carries everything needed to authorize
+        if current_app.config['JWT_STATELESS']:
+            claims['username'] = self.username
+            claims['role'] = self.role
+        return jwt.encode(claims, current_app.config['SECRET_KEY'], algorithm='HS256')
+    
+    def revoke_tokens(self):
+        """Invalidate every token issued to this user so far"""
+        self.token_version = (self.token_version or 0) + 1
     
     @staticmethod
     def verify_auth_token(token):
@@ -154,17 +186,6 @@ class User(db.Model):
         except:
             return None
     
-    # Role-based helpers
-    def has_role(self, role_name):
-        """Check if user has the specified role"""
-        return self.ROLES.get(self.role, 0) >= self.ROLES.get(role_name, 0)
-    
-    def is_admin(self):
-        return self.has_role('admin')
-    
-    def is_author(self):
-        return self.has_role('author') or self.is_admin()
-    
     # Serialize user for JSON response
     def to_dict(self):
         return {
@@ -172,12 +193,20 @@ class User(db.Model):
             "username": self.username,
             "email": self.email,
             "role": self.role,
-            "created_at": self.created_at.isoformat()
+            "created_at": self.created_at
         }
 
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        # Published listing, newest first
+        db.Index('ix_posts_published_created_at', 'published', 'created_at'),
+        # Admin listing of every post, paged on (created_at, id)
+        db.Index('ix_posts_created_at_id', 'created_at', 'id'),
+        # User.posts and per-author post counts
+        db.Index('ix_posts_author_id', 'author_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     title = db.Column(db.String(255), nullable=False)
@@ -187,9 +216,21 @@ class Post(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Denormalized count maintained by the Comment insert/delete listeners below
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
     
     comments = db.relationship('Comment', backref='post', lazy=True, cascade='all, delete-orphan')
     
+    @classmethod
+    def recount_comments(cls):
+        """Recompute every post's comment_count from the comments table"""
+        count = db.select(db.func.count(Comment.id)).where(
+            Comment.post_id == cls.id
+        ).scalar_subquery()
+        return db.session.execute(
+            db.update(cls).values(comment_count=count, updated_at=cls.updated_at)
+        ).rowcount
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -198,14 +239,18 @@ class Post(db.Model):
             'content': self.content,
             'published': self.published,
             'author_id': self.author_id,
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'comment_count': len(self.comments)
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'comment_count': self.comment_count
         }
 
 
 class Comment(db.Model):
     __tablename__ = 'comments'
+    __table_args__ = (
+        # A post's comments in order
+        db.Index('ix_comments_post_id_created_at', 'post_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     content = db.Column(db.Text, nullable=False)
@@ -216,3 +261,99 @@ class Comment(db.Model):
     
     def __repr__(self):
         return f'<Comment {self.id}>'
+
+
+def adjust_comment_counts(connection, deltas):
+    """Move the comment_count of several posts in one UPDATE.
+
+    deltas maps post id -> change. Done in SQL on the caller's connection so
+    the counters move in the same transaction as the comment rows;
+    updated_at is kept as is because a new comment is not an edit of the post.
+    """
+    posts = Post.__table__
+    connection.execute(
+        posts.update()
+        .where(posts.c.id.in_(deltas))
+        .values(comment_count=posts.c.comment_count + db.case(deltas, value=posts.c.id),
+                updated_at=posts.c.updated_at)
+    )
+
+
+# The listeners below only tally each flush's comment inserts and deletes;
+# the counters are moved once per flush, with one UPDATE for every post
+_COMMENT_DELTAS = 'comment_count_deltas'
+
+
+def _tally_comment(target, delta):
+    deltas = db.inspect(target).session.info.setdefault(_COMMENT_DELTAS, {})
+    deltas[target.post_id] = deltas.get(target.post_id, 0) + delta
+
+
+@db.event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    _tally_comment(target, 1)
+
+
+@db.event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    _tally_comment(target, -1)
+
+
+@db.event.listens_for(db.session, 'before_flush')
+def _reset_comment_deltas(session, flush_context, instances):
+    # Left over from a flush that failed before after_flush
+    session.info.pop(_COMMENT_DELTAS, None)
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def _apply_comment_deltas(session, flush_context):
+    deltas = session.info.pop(_COMMENT_DELTAS, None)
+    if not deltas:
+        return
+    # A post deleted in this flush takes its counter with it, so the
+    # comments its cascade removed need no update
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, Post)}
+    deltas = {post_id: delta for post_id, delta in deltas.items() if delta and post_id not in deleted}
+    if deltas:
+        adjust_comment_counts(session.connection(), deltas)
+
+
+class Generation(db.Model):
+    """A counter per set of rows, bumped in the same transaction as every
+    change to them, so a validator for the whole set is one primary key read
+    instead of an aggregate over the table."""
+    __tablename__ = 'generations'
+    
+    # Every post insert, edit and delete, whichever listing it shows in
+    POSTS = 'posts'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    
+    @classmethod
+    def current(cls, name):
+        return db.session.query(cls.value).filter(cls.name == name).scalar()
+    
+    @classmethod
+    def bump(cls, connection, name):
+        generations = cls.__table__
+        connection.execute(
+            generations.update()
+            .where(generations.c.name == name)
+            .values(value=generations.c.value + 1)
+        )
+
+
+# The rows the migration inserts, for databases made with create_all
+db.event.listen(Generation.__table__, 'after_create', db.DDL(
+    f"INSERT INTO generations (name, value) VALUES ('{Generation.POSTS}', 0)"
+))
+
+
+@db.event.listens_for(db.session, 'after_flush')
+def _bump_post_generation(session, flush_context):
+    # new/dirty/deleted still describe what this flush wrote
+    if (any(isinstance(obj, Post) for obj in session.new)
+            or any(isinstance(obj, Post) for obj in session.deleted)
+            or any(isinstance(obj, Post) and session.is_modified(obj) for obj in session.dirty)):
+        Generation.bump(session.connection(), Generation.POSTS)
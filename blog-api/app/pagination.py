@@ -0,0 +1,91 @@
+import base64
+import json
+from datetime import datetime
+from flask import request
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) position as an opaque URL-safe token"""
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a token produced by encode_cursor back into (created_at, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def page_args():
+    """Read and validate the limit/cursor query parameters"""
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidCursor('Invalid limit')
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+def keyset_query(query, created_col, id_col, limit, position=None, descending=True):
+    """Apply keyset_page's range predicate, order and limit to query.
+
+    Works on a Query or a select(), so callers that run the statement
+    themselves can pass the rows to keyset_result.
+    """
+    if position is not None:
+        created_at, row_id = position
+        if descending:
+            query = query.filter(or_(
+                created_col < created_at,
+                and_(created_col == created_at, id_col < row_id)
+            ))
+        else:
+            query = query.filter(or_(
+                created_col > created_at,
+                and_(created_col == created_at, id_col > row_id)
+            ))
+
+    if descending:
+        query = query.order_by(created_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(created_col.asc(), id_col.asc())
+
+    # Fetch one extra row to know whether another page exists
+    return query.limit(limit + 1)
+
+
+def keyset_result(rows, limit):
+    """Trim the extra row keyset_query fetched; returns (rows, next_cursor)"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return rows, next_cursor
+
+
+def keyset_page(query, created_col, id_col, limit, position=None, descending=True):
+    """Return (rows, next_cursor) for the page after position.
+
+    Rows are ordered by (created_at, id), newest first unless descending
+    is False, and the page is selected with a range predicate on that key
+    instead of OFFSET, so fetching a deep page costs the same as fetching
+    the first one.
+    """
+    rows = keyset_query(query, created_col, id_col, limit, position, descending).all()
+    return keyset_result(rows, limit)
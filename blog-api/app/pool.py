@@ -0,0 +1,126 @@
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+    def recreate(self):
+        # dispose() builds a fresh pool; carry the running totals over
+        pool = super().recreate()
+        pool.checkouts, pool.wait_total, pool.wait_max = self.checkouts, self.wait_total, self.wait_max
+        return pool
+
+
+def engine_options(config, uri=None):
+    """Build engine options for uri (the primary by default) from the DB_* settings"""
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'] or 'sqlite://')
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+
+    # In-memory SQLite lives in a single connection, so there is no pool to size
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    })
+
+    timeout_ms = config['DB_STATEMENT_TIMEOUT_MS']
+    if timeout_ms and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f'-c statement_timeout={timeout_ms}'}
+    return options
+
+
+def install_sqlite_statement_timeout(engine, timeout_ms):
+    """Abort SQLite statements that run longer than timeout_ms.
+
+    SQLite has no statement_timeout setting, so a progress handler checks
+    a per-connection deadline that is armed around each execute.
+    """
+    if engine.dialect.name != 'sqlite' or not timeout_ms:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def _install_handler(dbapi_connection, connection_record):
+        state = connection_record.info['statement_deadline'] = {'at': None}
+        dbapi_connection.set_progress_handler(
+            lambda: state['at'] is not None and time.monotonic() > state['at'], 10000
+        )
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _arm(conn, cursor, statement, parameters, context, executemany):
+        state = conn.info.get('statement_deadline')
+        if state is not None:
+            state['at'] = time.monotonic() + timeout_ms / 1000
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _disarm(conn, cursor, statement, parameters, context, executemany):
+        state = conn.info.get('statement_deadline')
+        if state is not None:
+            state['at'] = None
+
+
+@contextmanager
+def statement_timeout_disabled(conn):
+    """Lift the per-statement timeout on conn for a long maintenance job"""
+    if conn.dialect.name == 'postgresql':
+        conn.exec_driver_sql('SET statement_timeout = 0')
+        try:
+            yield conn
+        finally:
+            conn.exec_driver_sql('RESET statement_timeout')
+    else:
+        # Without its deadline state the SQLite progress handler never fires
+        state = conn.info.pop('statement_deadline', None)
+        try:
+            yield conn
+        finally:
+            if state is not None:
+                conn.info['statement_deadline'] = state
+
+
+def pool_status(engine):
+    """Current occupancy and checkout wait figures for engine's pool"""
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+    if isinstance(pool, TimedQueuePool):
+        with pool._stats_lock:
+            status.update({
+                'checkouts': pool.checkouts,
+                'wait_avg_ms': 1000 * pool.wait_total / pool.checkouts if pool.checkouts else 0.0,
+                'wait_max_ms': 1000 * pool.wait_max,
+            })
+    return status
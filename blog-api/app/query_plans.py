@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from sqlalchemy import text
+from . import db
+from .models import User, Post, Comment, Generation
+from .pagination import DEFAULT_PAGE_SIZE, keyset_query
+
+# Tables that must never be read with a full scan by the queries below
+INDEXED_TABLES = ('users', 'posts', 'comments', 'generations')
+
+# Listings are checked on a page after the first: its cursor range has to
+# be an index search, where the first page may simply walk an index
+_POSITION = (datetime(2026, 1, 1), 1)
+
+
+def hot_queries():
+    """The queries behind the main endpoints, built the way the routes build them"""
+    from .routes import USER_FIELDS, post_summary_query, comments_query
+    return {
+        'published post listing': keyset_query(
+            post_summary_query().filter(Post.published.is_(True)),
+            Post.created_at, Post.id, DEFAULT_PAGE_SIZE, _POSITION),
+        'admin post listing': keyset_query(
+            post_summary_query(), Post.created_at, Post.id, DEFAULT_PAGE_SIZE, _POSITION),
+        'listing validators': db.session.query(Generation.value)
+            .filter(Generation.name == Generation.POSTS),
+        'comments of a post': keyset_query(
+            comments_query(1), Comment.created_at, Comment.id, DEFAULT_PAGE_SIZE, _POSITION,
+            descending=False),
+        'posts of an author': Post.query.filter(Post.author_id == 1),
+        'admin user listing': keyset_query(
+            USER_FIELDS.query(None), User.created_at, User.id, DEFAULT_PAGE_SIZE, _POSITION),
+    }
+
+
+def _sqlite_full_scans(sql):
+    plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql)).all()
+    lines = [row[-1] for row in plan]
+    # Any "SCAN posts", with or without "USING INDEX", reads the whole table
+    # or index; a sort in a temp B-tree means no index gives the order
+    scans = [line for line in lines
+             if (line.startswith('SCAN ') and line.split()[1] in INDEXED_TABLES)
+             or line.startswith('USE TEMP B-TREE FOR ORDER BY')]
+    return scans, lines
+
+
+def _postgres_full_scans(sql):
+    # Forbid sequential scans so the planner only falls back to one when no
+    # usable index exists, which is the regression we are looking for
+    db.session.execute(text('SET LOCAL enable_seqscan = off'))
+    plan = db.session.execute(text('EXPLAIN (FORMAT JSON) ' + sql)).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans, nodes = [], [plan[0]['Plan']]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in INDEXED_TABLES:
+            scans.append(f"Seq Scan on {node['Relation Name']}")
+        elif node['Node Type'] == 'Sort':
+            scans.append(f"Sort on {', '.join(node.get('Sort Key', []))}")
+        nodes.extend(node.get('Plans', []))
+    return scans, json.dumps(plan, indent=2).splitlines()
+
+
+def check_query_plans():
+    """EXPLAIN each hot query; returns [(name, full_scans_and_sorts, plan_lines)]"""
+    dialect = db.session.get_bind().dialect
+    explain = _postgres_full_scans if dialect.name == 'postgresql' else _sqlite_full_scans
+
+    results = []
+    for name, query in hot_queries().items():
+        sql = str(query.statement.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+        scans, plan = explain(sql)
+        results.append((name, scans, plan))
+    db.session.rollback()
+    return results
@@ -1,19 +1,58 @@
-from flask import Blueprint, jsonify, request, current_app
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, jsonify, request, current_app, abort
 # import jwt
 import time
 from datetime import datetime, timedelta
+from collections import Counter, defaultdict
+from sqlalchemy import func, insert, or_, select, true, union_all
+from sqlalchemy.orm import defer
 from . import db
-from .models import User, Post, Comment
-from .auth import token_required, admin_required, author_required
+from .models import User, Post, Comment, Generation, adjust_comment_counts
+from .cache import response_cache
+from .auth import token_required, admin_required, author_required, principal_cache
+from .conditional import make_etag, not_modified, add_validators
+from .hashing import HasherBusy
+from .pool import pool_status
+from .routing import REPLICA_BIND, read_from_replica, skips_response_cache
+from .fieldsets import Field, FieldSet, InvalidFields
+from .pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, InvalidCursor, page_args, keyset_page, keyset_result
+)
+from .search import index_post, unindex_post, search_post_ids
 
 bp = Blueprint('api', __name__)
 
+# Characters of post content shown in listings
+EXCERPT_LENGTH = 150
+
+# Deepest search result a client may page to
+MAX_SEARCH_OFFSET = 1000
+
+# Most posts or comments one batch request may name
+MAX_BATCH_SIZE = 100
+
+def serve_cached(entry):
+    """Replay a cached response, or a 304 if the client already has it"""
+    return not_modified(entry.etag) or add_validators(
+        current_app.response_class(entry.body, mimetype='application/json'),
+        entry.etag
+    )
+
 # -------------------- Public Routes --------------------
 @bp.route('/')
 def home():
     return jsonify({"message": "Blog API is running"})
 
+@bp.route('/ready')
+def ready():
+    """Readiness probe: 200 once every database this worker uses answers"""
+    try:
+        for engine in db.engines.values():
+            with engine.connect() as conn:
+                conn.exec_driver_sql('SELECT 1')
+    except Exception:
+        return jsonify({'status': 'unavailable'}), 503
+    return jsonify({'status': 'ready'})
+
 @bp.route('/debug/routes')
 def debug_routes():
     """Debug endpoint to list all registered routes"""
@@ -28,6 +67,11 @@ def debug_routes():
     return jsonify({'routes': routes})
 
 # -------------------- Authentication Routes --------------------
+def hasher_busy_response():
+    """Shed load while every password hashing slot on the host is taken"""
+    retry_after = current_app.config['PASSWORD_HASH_RETRY_AFTER']
+    return jsonify({'message': 'Server busy, please retry'}), 503, {'Retry-After': str(retry_after)}
+
 @bp.route('/register', methods=['POST'])
 def register():
     data = request.get_json()
@@ -48,7 +92,10 @@ def register():
         username=data['username'],
         email=data['email']
     )
-    new_user.set_password(data['password'])
+    try:
+        new_user.set_password(data['password'])
+    except HasherBusy:
+        return hasher_busy_response()
     
     db.session.add(new_user)
     db.session.commit()
@@ -77,8 +124,16 @@ def login():
     
     user = User.query.filter_by(email=data['email']).first()
     
-    if not user or not user.check_password(data['password']):
-        return jsonify({'message': 'Invalid email or password'}), 401
+    try:
+        if not user or not user.check_password(data['password']):
+            return jsonify({'message': 'Invalid email or password'}), 401
+        
+        # Upgrade hashes made with an older method or cost
+        if user.password_needs_rehash():
+            user.set_password(data['password'])
+            db.session.commit()
+    except HasherBusy:
+        return hasher_busy_response()
     
     # Generate token
     token = user.generate_auth_token()
@@ -93,25 +148,137 @@ def login():
         }
     })
 
+@bp.route('/logout', methods=['POST'])
+@token_required
+def logout(current_user):
+    # Revoke every token issued to this user so far
+    user = db.session.get(User, current_user.id)
+    user.revoke_tokens()
+    db.session.commit()
+    
+    return jsonify({'message': 'Logged out successfully'})
+
 # -------------------- Post Routes --------------------
+def _join_post_author(query):
+    return query.join(User, Post.author_id == User.id)
+
+# Fields of a post in listings; the excerpt is cut in the database so full
+# post bodies are never loaded
+POST_SUMMARY_FIELDS = FieldSet(Post, {
+    'id': Field(Post.id),
+    'title': Field(Post.title),
+    'slug': Field(Post.slug),
+    'excerpt': Field(
+        func.substr(Post.content, 1, EXCERPT_LENGTH).label('excerpt'),
+        (func.length(Post.content) > EXCERPT_LENGTH).label('truncated'),
+        render=lambda row: row.excerpt + '...' if row.truncated else row.excerpt
+    ),
+    'author': Field(User.username.label('author'), join='author'),
+    'created_at': Field(Post.created_at),
+    'updated_at': Field(Post.updated_at)
+}, required=(Post.id, Post.created_at), joins={'author': _join_post_author})
+
+def post_summary_query(fields=None):
+    """One query selecting only the columns the listed fields need"""
+    return POST_SUMMARY_FIELDS.query(fields)
+
+def post_summary(post, fields=None):
+    return POST_SUMMARY_FIELDS.render(post, fields)
+
+def listing_cache_key(current_user, limit, fields=None):
+    """Everyone but admins sees the same published listing, which is cached"""
+    if current_user.is_admin():
+        return None
+    return response_cache().listing_key('published', limit, request.args.get('cursor'),
+                                        POST_SUMMARY_FIELDS.key(fields))
+
+def listing_query(current_user, fields=None):
+    query = post_summary_query(fields)
+    
+    # Admins can see all posts, others only see published posts
+    if not current_user.is_admin():
+        query = query.filter(Post.published.is_(True))
+    return query
+
+def listing_etag(current_user, limit, version, fields=None):
+    # version moves with every post write (see Generation), whatever the page
+    return make_etag('posts', current_user.is_admin(), version,
+                     limit, request.args.get('cursor'), POST_SUMMARY_FIELDS.key(fields))
+
+def listing_response(posts, next_cursor, etag, cache_key, fields=None):
+    response = add_validators(jsonify({
+        'posts': [post_summary(post, fields) for post in posts],
+        'next_cursor': next_cursor
+    }), etag)
+    
+    if cache_key and not read_from_replica():
+        response_cache().set(cache_key, response.get_data(), etag)
+    return response
+
 @bp.route('/posts', methods=['GET'])
 @token_required
 def get_posts(current_user):
-    # Admins can see all posts, others only see published posts
-    if current_user.is_admin():
-        posts = Post.query.all()
-    else:
-        posts = Post.query.filter_by(published=True).all()
-    
-    return jsonify([{
-        'id': post.id,
-        'title': post.title,
-        'slug': post.slug,
-        'excerpt': post.content[:150] + '...' if len(post.content) > 150 else post.content,
-        'author': post.author.username,
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat() if post.updated_at else None
-    } for post in posts])
+    # ?ids=1,2,3 fetches those posts instead of a page of the listing
+    if 'ids' in request.args:
+        return get_posts_by_id(current_user)
+    
+    try:
+        limit, position = page_args()
+        fields = POST_SUMMARY_FIELDS.parse()
+    except (InvalidCursor, InvalidFields) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    cache_key = listing_cache_key(current_user, limit, fields)
+    if cache_key and not skips_response_cache(current_user.id):
+        entry = response_cache().get(cache_key)
+        if entry:
+            return serve_cached(entry)
+    
+    # Validators are checked before the page is built; the version is a
+    # primary key lookup, whatever the size of the table
+    etag = listing_etag(current_user, limit, Generation.current(Generation.POSTS), fields)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    posts, next_cursor = keyset_page(listing_query(current_user, fields), Post.created_at, Post.id,
+                                     limit, position)
+    
+    return listing_response(posts, next_cursor, etag, cache_key, fields)
+
+@bp.route('/posts/search', methods=['GET'])
+@token_required
+def search_posts(current_user):
+    terms = request.args.get('q', '').strip()
+    if not terms:
+        return jsonify({'message': 'Search query is required'}), 400
+    
+    # Relevance order has no stable key to range over, so results are paged
+    # by offset, capped at MAX_SEARCH_OFFSET
+    try:
+        limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'message': 'Invalid limit or offset'}), 400
+    try:
+        fields = POST_SUMMARY_FIELDS.parse()
+    except InvalidFields as e:
+        return jsonify({'message': str(e)}), 400
+    if offset > MAX_SEARCH_OFFSET:
+        return jsonify({'message': 'Offset too large, refine the search'}), 400
+    
+    # Admins can search all posts, others only published posts
+    matches = search_post_ids(terms, not current_user.is_admin(), limit + 1, offset)
+    has_more = len(matches) > limit
+    matches = matches[:limit]
+    
+    rows = {row.id: row for row in post_summary_query(fields).filter(Post.id.in_([m[0] for m in matches]))}
+    
+    return jsonify({
+        'posts': [dict(post_summary(rows[post_id], fields), rank=rank)
+                  for post_id, rank in matches if post_id in rows],
+        'next_offset': offset + limit if has_more else None
+    })
 
 @bp.route('/posts', methods=['POST'])
 @token_required
@@ -135,8 +302,13 @@ def create_post(current_user):
     )
     
     db.session.add(new_post)
+    db.session.flush()
+    index_post(new_post)
     db.session.commit()
     
+    if new_post.published:
+        response_cache().invalidate_listing()
+    
     return jsonify({
         'message': 'Post created successfully',
         'post': {
@@ -148,33 +320,239 @@ def create_post(current_user):
     }), 201
 
 # -------------------- Comment Routes --------------------
+COMMENT_FIELDS = FieldSet(Comment, {
+    'id': Field(Comment.id),
+    'content': Field(Comment.content),
+    'author': Field(User.username.label('author'), join='author'),
+    'created_at': Field(Comment.created_at)
+}, required=(Comment.id, Comment.created_at), joins={
+    'author': lambda query: query.join(User, Comment.user_id == User.id)
+})
+
+def comments_query(post_id, fields=None):
+    """A post's comments, with their authors joined in when wanted"""
+    return COMMENT_FIELDS.query(fields).filter(Comment.post_id == post_id)
+
+def comment_summary(comment, fields=None):
+    return COMMENT_FIELDS.render(comment, fields)
+
+def comments_page(post_id, limit, position=None, fields=None):
+    """Return one page of a post's comments, oldest first"""
+    comments, next_cursor = keyset_page(
+        comments_query(post_id, fields), Comment.created_at, Comment.id, limit, position, descending=False
+    )
+    
+    return [comment_summary(comment, fields) for comment in comments], next_cursor
+
+def can_view(current_user, post):
+    """Unpublished posts are only visible to admins or their author"""
+    return post.published or current_user.is_admin() or current_user.id == post.author_id
+
+def post_meta_query(post_id):
+    """What the visibility check and validators need, without the post body"""
+    return db.session.query(
+        Post.published, Post.author_id, Post.updated_at, Post.comment_count
+    ).filter(Post.id == post_id)
+
+# Fields of a single post. The embedded first page of comments is loaded
+# separately, only when comments or comments_next_cursor is requested
+POST_DETAIL_FIELDS = FieldSet(Post, {
+    'id': Field(Post.id),
+    'title': Field(Post.title),
+    'content': Field(Post.content),
+    'slug': Field(Post.slug),
+    'published': Field(Post.published),
+    'author': Field(
+        Post.author_id, User.username.label('author_username'),
+        render=lambda row: {'id': row.author_id, 'username': row.author_username},
+        join='author'
+    ),
+    'created_at': Field(Post.created_at),
+    'updated_at': Field(Post.updated_at),
+    'comments': Field(),
+    'comment_count': Field(Post.comment_count),
+    'comments_next_cursor': Field()
+}, required=(Post.id,), joins={'author': _join_post_author})
+
+def post_detail_query(post_id, fields=None):
+    return POST_DETAIL_FIELDS.query(fields).filter(Post.id == post_id)
+
+def post_wants_comments(fields):
+    return (POST_DETAIL_FIELDS.wants(fields, 'comments')
+            or POST_DETAIL_FIELDS.wants(fields, 'comments_next_cursor'))
+
+def post_etag(post_id, meta, fields=None):
+    # comment_count is part of the tag because the first page of comments is embedded
+    return make_etag('post', post_id, meta.updated_at, meta.comment_count, POST_DETAIL_FIELDS.key(fields))
+
+def post_detail_response(row, comments, next_cursor, etag, meta, cache_key, fields=None):
+    data = POST_DETAIL_FIELDS.render(row, fields)
+    if POST_DETAIL_FIELDS.wants(fields, 'comments'):
+        data['comments'] = comments
+    if POST_DETAIL_FIELDS.wants(fields, 'comments_next_cursor'):
+        data['comments_next_cursor'] = next_cursor
+    response = add_validators(jsonify(data), etag)
+    
+    # Only the full representation is cached (cache_key is None otherwise),
+    # and never when it was read from a lagging replica
+    if cache_key and meta.published and not read_from_replica():
+        response_cache().set(cache_key, response.get_data(), etag)
+    return response
+
 @bp.route('/posts/<int:post_id>', methods=['GET'])
 @token_required
 def get_post(current_user, post_id):
-    post = Post.query.get_or_404(post_id)
+    try:
+        fields = POST_DETAIL_FIELDS.parse()
+    except InvalidFields as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Published posts look the same to every caller and are cached. The key
+    # is taken before the database read, see ResponseCache
+    cache_key = response_cache().post_key(post_id) if fields is None else None
+    if cache_key and not skips_response_cache(current_user.id):
+        entry = response_cache().get(cache_key)
+        if entry:
+            return serve_cached(entry)
+    
+    # Read only the metadata first, so a conditional request that matches
+    # never loads the post or comments
+    meta = post_meta_query(post_id).first()
+    if meta is None:
+        abort(404)
+    
+    if not can_view(current_user, meta):
+        return jsonify({'message': 'Post not found'}), 404
     
-    # Only show unpublished posts to admins or the author
-    if not post.published and not (current_user.is_admin() or current_user.id == post.author_id):
+    etag = post_etag(post_id, meta, fields)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    
+    # Only the columns behind the requested fields are read
+    row = post_detail_query(post_id, fields).first()
+    if row is None:
+        abort(404)
+    
+    # Embed only the first page of comments; the rest come from
+    # GET /posts/<id>/comments using comments_next_cursor
+    comments, next_cursor = None, None
+    if post_wants_comments(fields):
+        comments, next_cursor = comments_page(post_id, DEFAULT_PAGE_SIZE)
+    
+    return post_detail_response(row, comments, next_cursor, etag, meta, cache_key, fields)
+
+# -------------------- Batch Reads --------------------
+def batch_ids():
+    """The post ids named by ?ids=, deduplicated in request order"""
+    try:
+        ids = [int(part) for part in request.args['ids'].split(',') if part.strip()]
+    except ValueError:
+        raise ValueError('Invalid ids')
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise ValueError('No ids requested')
+    if len(ids) > MAX_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_BATCH_SIZE} ids may be requested at once')
+    return ids
+
+def visible_posts(query, current_user):
+    """query narrowed to the posts current_user can see (see can_view)"""
+    if current_user.is_admin():
+        return query
+    return query.filter(or_(Post.published.is_(True), Post.author_id == current_user.id))
+
+def posts_by_id_query(current_user, ids, fields=None):
+    """The requested posts current_user can see, with the same columns as get_post"""
+    return visible_posts(POST_DETAIL_FIELDS.query(fields).filter(Post.id.in_(ids)), current_user)
+
+def first_comments_query(current_user, post_ids):
+    """The first page of comments of every post in post_ids that current_user
+    can see, as one statement.
+
+    Each post's page is its own ORDER BY ... LIMIT over the (post_id,
+    created_at) index, so a post costs DEFAULT_PAGE_SIZE + 1 rows however
+    many comments it has; the extra row tells keyset_result whether the post
+    has another page. PostgreSQL runs the pages as a LATERAL join. SQLite has
+    no LATERAL, so there they are a UNION ALL of one SELECT per post.
+    """
+    def page(query):
+        return query.add_columns(Comment.post_id) \
+            .order_by(Comment.created_at, Comment.id).limit(DEFAULT_PAGE_SIZE + 1)
+    
+    if db.session.get_bind().dialect.name == 'postgresql':
+        requested = visible_posts(select(Post.id), current_user).where(Post.id.in_(post_ids)).subquery('requested')
+        pages = page(COMMENT_FIELDS.query(None).filter(Comment.post_id == requested.c.id)).statement.lateral('page')
+        comments = select(pages).select_from(requested).join(pages, true())
+    else:
+        branches = []
+        for post_id in post_ids:
+            query = COMMENT_FIELDS.query(None).join(Post, Post.id == Comment.post_id).filter(Comment.post_id == post_id)
+            branch = page(visible_posts(query, current_user)).subquery()
+            branches.append(select(branch))
+        comments = select(union_all(*branches).subquery('page'))
+    columns = comments.selected_columns
+    return comments.order_by(columns.post_id, columns.created_at, columns.id)
+
+def posts_by_id_response(ids, rows, comment_rows, fields=None):
+    """Posts in the order requested; ids not found or not visible are listed as missing"""
+    comments = defaultdict(list)
+    for comment in comment_rows:
+        comments[comment.post_id].append(comment)
+    
+    found = {row.id: row for row in rows}
+    posts = []
+    for post_id in ids:
+        if post_id not in found:
+            continue
+        data = POST_DETAIL_FIELDS.render(found[post_id], fields)
+        page, next_cursor = keyset_result(comments[post_id], DEFAULT_PAGE_SIZE)
+        if POST_DETAIL_FIELDS.wants(fields, 'comments'):
+            data['comments'] = [comment_summary(comment) for comment in page]
+        if POST_DETAIL_FIELDS.wants(fields, 'comments_next_cursor'):
+            data['comments_next_cursor'] = next_cursor
+        posts.append(data)
+    
+    return jsonify({
+        'posts': posts,
+        'missing': [post_id for post_id in ids if post_id not in found]
+    })
+
+def get_posts_by_id(current_user):
+    """GET /posts?ids=: several posts in two queries, however many are named"""
+    try:
+        ids = batch_ids()
+        fields = POST_DETAIL_FIELDS.parse()
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    rows = posts_by_id_query(current_user, ids, fields).all()
+    comment_rows = []
+    if rows and post_wants_comments(fields):
+        comment_rows = db.session.execute(first_comments_query(current_user, [row.id for row in rows])).all()
+    
+    return posts_by_id_response(ids, rows, comment_rows, fields)
+
+@bp.route('/posts/<int:post_id>/comments', methods=['GET'])
+@token_required
+def get_comments(current_user, post_id):
+    # Only the visibility check is needed, so the post body is not loaded
+    post = Post.query.options(defer(Post.content)).get_or_404(post_id)
+    
+    if not can_view(current_user, post):
         return jsonify({'message': 'Post not found'}), 404
     
+    try:
+        limit, position = page_args()
+        fields = COMMENT_FIELDS.parse()
+    except (InvalidCursor, InvalidFields) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    comments, next_cursor = comments_page(post.id, limit, position, fields)
+    
     return jsonify({
-        'id': post.id,
-        'title': post.title,
-        'content': post.content,
-        'slug': post.slug,
-        'published': post.published,
-        'author': {
-            'id': post.author.id,
-            'username': post.author.username
-        },
-        'created_at': post.created_at.isoformat(),
-        'updated_at': post.updated_at.isoformat() if post.updated_at else None,
-        'comments': [{
-            'id': comment.id,
-            'content': comment.content,
-            'author': comment.author.username,
-            'created_at': comment.created_at.isoformat()
-        } for comment in post.comments]
+        'comments': comments,
+        'next_cursor': next_cursor
     })
 
 @bp.route('/posts/<int:post_id>', methods=['PUT'])
@@ -187,6 +565,7 @@ def update_post(current_user, post_id):
         return jsonify({'message': 'Not authorized to update this post'}), 403
     
     data = request.get_json()
+    was_published = post.published
     
     # Update fields if provided
     if 'title' in data:
@@ -197,8 +576,14 @@ def update_post(current_user, post_id):
         post.published = data['published']
     
     post.updated_at = datetime.utcnow()
+    if 'title' in data or 'content' in data:
+        index_post(post)
     db.session.commit()
     
+    response_cache().invalidate_post(post_id)
+    if was_published or post.published:
+        response_cache().invalidate_listing()
+    
     return jsonify({'message': 'Post updated successfully'})
 
 @bp.route('/posts/<int:post_id>', methods=['DELETE'])
@@ -210,15 +595,21 @@ def delete_post(current_user, post_id):
     if current_user.id != post.author_id and not current_user.is_admin():
         return jsonify({'message': 'Not authorized to delete this post'}), 403
     
+    was_published = post.published
     db.session.delete(post)
+    unindex_post(post_id)
     db.session.commit()
     
+    response_cache().invalidate_post(post_id)
+    if was_published:
+        response_cache().invalidate_listing()
+    
     return jsonify({'message': 'Post deleted successfully'})
 
 @bp.route('/posts/<int:post_id>/comments', methods=['POST'])
 @token_required
 def create_comment(current_user, post_id):
-    post = Post.query.get_or_404(post_id)
+    post = Post.query.options(defer(Post.content)).get_or_404(post_id)
     
     # Can't comment on unpublished posts unless admin or author
     if not post.published and not (current_user.is_admin() or current_user.id == post.author_id):
@@ -238,30 +629,129 @@ def create_comment(current_user, post_id):
     db.session.add(new_comment)
     db.session.commit()
     
+    # The post detail embeds comments; the listing does not
+    response_cache().invalidate_post(post_id)
+    
     return jsonify({
         'message': 'Comment added successfully',
         'comment': {
             'id': new_comment.id,
             'content': new_comment.content,
             'author': current_user.username,
-            'created_at': new_comment.created_at.isoformat()
+            'created_at': new_comment.created_at
         }
     }), 201
 
+@bp.route('/comments', methods=['POST'])
+@token_required
+def create_comments(current_user):
+    """Add several comments, possibly to different posts, in one transaction.
+
+    Each item gets its own result, in request order, with the status the
+    single-comment endpoint would have returned. Valid items are saved
+    even when others are rejected. However many items there are, the
+    posts are read with one query, the comments are written with one
+    multi-row INSERT (SQLite, which cannot return ids in row order, gets
+    one per row) and the comment counts are moved with one UPDATE.
+    """
+    data = request.get_json(silent=True)
+    items = data.get('comments') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({'message': 'A list of comments is required'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'message': f'At most {MAX_BATCH_SIZE} comments may be added at once'}), 400
+    
+    post_ids = {item.get('post_id') for item in items if isinstance(item, dict)}
+    posts = {post.id: post for post in db.session.query(Post.id, Post.published, Post.author_id)
+             .filter(Post.id.in_([post_id for post_id in post_ids if type(post_id) is int]))}
+    
+    results = []
+    new_comments = []
+    for item in items:
+        post = posts.get(item.get('post_id')) if isinstance(item, dict) else None
+        if not isinstance(item, dict) or not item.get('content'):
+            results.append({'status': 400, 'message': 'Comment content is required'})
+        elif post is None:
+            results.append({'status': 404, 'message': 'Post not found'})
+        elif not can_view(current_user, post):
+            results.append({'status': 403, 'message': 'Cannot comment on unpublished posts'})
+        else:
+            results.append(None)
+            new_comments.append({'content': item['content'], 'user_id': current_user.id, 'post_id': post.id})
+    
+    if new_comments:
+        # A bulk INSERT skips the mapper's after_insert listener, so the
+        # counters are moved here, one UPDATE for all the posts
+        created = iter(db.session.execute(
+            insert(Comment).returning(Comment.id, Comment.created_at, sort_by_parameter_order=True),
+            new_comments
+        ).all())
+        comment_counts = Counter(comment['post_id'] for comment in new_comments)
+        adjust_comment_counts(db.session.connection(), comment_counts)
+        db.session.commit()
+        
+        for post_id in comment_counts:
+            response_cache().invalidate_post(post_id)
+        
+        comments = iter(new_comments)
+        for index, result in enumerate(results):
+            if result is None:
+                comment, row = next(comments), next(created)
+                results[index] = {'status': 201, 'comment': {
+                    'id': row.id,
+                    'post_id': comment['post_id'],
+                    'content': comment['content'],
+                    'author': current_user.username,
+                    'created_at': row.created_at
+                }}
+    
+    # 207 Multi-Status when some items were rejected
+    status = 201 if all(result['status'] == 201 for result in results) else 207
+    return jsonify({'results': results}), status
+
 # Admin routes
+# Counted per listed user over ix_posts_author_id; the database evaluates
+# the subquery for the page's rows only, after the LIMIT
+POST_COUNT = select(func.count(Post.id)).where(Post.author_id == User.id) \
+    .correlate(User).scalar_subquery().label('post_count')
+
+USER_FIELDS = FieldSet(User, {
+    'id': Field(User.id),
+    'username': Field(User.username),
+    'email': Field(User.email),
+    'role': Field(User.role),
+    'created_at': Field(User.created_at),
+    'post_count': Field(POST_COUNT)
+}, required=(User.id, User.created_at))
+
 @bp.route('/admin/users', methods=['GET'])
 @token_required
 @admin_required
 def get_all_users(current_user):
-    users = User.query.all()
-    return jsonify([{
-        'id': user.id,
-        'username': user.username,
-        'email': user.email,
-        'role': user.role,
-        'created_at': user.created_at.isoformat(),
-        'post_count': len(user.posts)
-    } for user in users])
+    try:
+        limit, position = page_args()
+        fields = USER_FIELDS.parse()
+    except (InvalidCursor, InvalidFields) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    query = USER_FIELDS.query(fields)
+    
+    role = request.args.get('role')
+    if role:
+        if role not in User.ROLES:
+            return jsonify({'message': 'Invalid role'}), 400
+        query = query.filter(User.role == role)
+    
+    username = request.args.get('username')
+    if username:
+        query = query.filter(User.username.startswith(username, autoescape=True))
+    
+    users, next_cursor = keyset_page(query, User.created_at, User.id, limit, position)
+    
+    return jsonify({
+        'users': [USER_FIELDS.render(user, fields) for user in users],
+        'next_cursor': next_cursor
+    })
 
 @bp.route('/admin/users/<int:user_id>/role', methods=['PUT'])
 @token_required
@@ -277,6 +767,8 @@ def update_user_role(current_user, user_id):
         return jsonify({'message': 'Invalid role'}), 400
     
     user.role = data['role']
+    # Tokens issued before the change may carry the old role
+    user.revoke_tokens()
     db.session.commit()
     
     return jsonify({
@@ -287,3 +779,23 @@ def update_user_role(current_user, user_id):
             'role': user.role
         }
     })
+
+@bp.route('/admin/cache/stats', methods=['GET'])
+@token_required
+@admin_required
+def cache_stats(current_user):
+    """Hit/miss counters for this worker process's caches"""
+    return jsonify({
+        'principal': principal_cache().stats(),
+        'responses': response_cache().stats()
+    })
+
+@bp.route('/admin/db/pool', methods=['GET'])
+@token_required
+@admin_required
+def db_pool_stats(current_user):
+    """Connection pool occupancy and checkout wait times for this worker"""
+    stats = pool_status(db.engine)
+    if REPLICA_BIND in db.engines:
+        stats['replica'] = pool_status(db.engines[REPLICA_BIND])
+    return jsonify(stats)
@@ -0,0 +1,82 @@
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+REPLICA_BIND = 'replica'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingSession(Session):
+    """Session that sends the reads of GET requests to the read replica.
+
+    Flushes and DML always go to the primary, as does everything outside a
+    read request. A user who has just written is pinned to the primary for
+    READ_YOUR_WRITES_SECONDS so they see their own changes straight away.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._reads_from_replica(clause):
+            # What the replica returned may lag the primary (see read_from_replica)
+            g.read_from_replica = True
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        if self._flushing or getattr(clause, 'is_dml', False):
+            return False
+        if not has_request_context() or request.method not in READ_METHODS:
+            return False
+        if REPLICA_BIND not in self._db.engines:
+            return False
+        user_id = g.get('current_user_id')
+        return user_id is None or not is_pinned(user_id)
+
+
+def _pin_key(user_id):
+    return f'pin:user:{user_id}'
+
+
+def is_pinned(user_id):
+    # Remember the answer for the rest of the request; it is asked per statement
+    pinned = g.get('pinned_to_primary')
+    if pinned is None:
+        backend = current_app.extensions['response_cache'].backend
+        pinned = g.pinned_to_primary = backend.flagged(_pin_key(user_id))
+    return pinned
+
+
+def pin_to_primary(user_id):
+    """Route user_id's reads to the primary for the read-your-writes window.
+
+    Pins are flags in the response cache backend, which are never evicted.
+    They are shared by all workers only when that backend is, so with a
+    replica and several workers RESPONSE_CACHE_URL is required (see
+    gunicorn.conf.py).
+    """
+    seconds = current_app.config['READ_YOUR_WRITES_SECONDS']
+    if seconds:
+        current_app.extensions['response_cache'].backend.flag(_pin_key(user_id), seconds)
+
+
+def read_from_replica():
+    """Whether this request has read from the replica.
+
+    A response built from such reads may predate a write that has already
+    retired the cached copy, so it must not be stored in the shared cache.
+    """
+    return g.get('read_from_replica', False)
+
+
+def skips_response_cache(user_id):
+    """Pinned users read the primary and must not be served a cached copy
+    that could predate their own write"""
+    return bool(current_app.config['REPLICA_DATABASE_URL']) and is_pinned(user_id)
+
+
+def _pin_after_commit(session):
+    if has_request_context() and g.get('current_user_id') is not None:
+        pin_to_primary(g.current_user_id)
+
+
+def init_routing(db):
+    """Pin the requesting user to the primary after each commit"""
+    db.event.listen(db.session, 'after_commit', _pin_after_commit)
@@ -0,0 +1,113 @@
+"""Full-text search over posts.
+
+On PostgreSQL posts carry a weighted tsvector column with a GIN index.
+On SQLite the same text is mirrored into an FTS5 virtual table keyed by
+post id. Both are created alongside the posts table and kept in sync by
+index_post/unindex_post, which run in the caller's transaction.
+"""
+from sqlalchemy import DDL, event, text
+from . import db
+from .models import Post
+
+SEARCH_CONFIG = 'english'
+
+_PG_VECTOR = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(content, '')), 'B')"
+)
+
+# Schema objects that create_all/drop_all do not know about
+event.listen(Post.__table__, 'after_create', DDL(
+    'ALTER TABLE posts ADD COLUMN search_vector tsvector'
+).execute_if(dialect='postgresql'))
+event.listen(Post.__table__, 'after_create', DDL(
+    'CREATE INDEX ix_posts_search_vector ON posts USING GIN (search_vector)'
+).execute_if(dialect='postgresql'))
+event.listen(Post.__table__, 'after_create', DDL(
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, content)'
+).execute_if(dialect='sqlite'))
+event.listen(Post.__table__, 'before_drop', DDL(
+    'DROP TABLE IF EXISTS posts_fts'
+).execute_if(dialect='sqlite'))
+
+
+def is_search_object(type_, name):
+    """True for the schema objects above, including the shadow tables FTS5
+    keeps next to posts_fts, which migrations/env.py hides from autogenerate"""
+    if type_ == 'table':
+        return name == 'posts_fts' or name.startswith('posts_fts_')
+    if type_ == 'column':
+        return name == 'search_vector'
+    if type_ == 'index':
+        return name == 'ix_posts_search_vector'
+    return False
+
+
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+def index_post(post):
+    """Write the post's current title and content into the search index"""
+    if _dialect() == 'postgresql':
+        db.session.execute(
+            text(f'UPDATE posts SET search_vector = {_PG_VECTOR} WHERE id = :id'),
+            {'id': post.id}
+        )
+    else:
+        unindex_post(post.id)
+        db.session.execute(
+            text('INSERT INTO posts_fts (rowid, title, content) VALUES (:id, :title, :content)'),
+            {'id': post.id, 'title': post.title, 'content': post.content}
+        )
+
+
+def unindex_post(post_id):
+    """Remove a post from the search index (PostgreSQL needs nothing here)"""
+    if _dialect() != 'postgresql':
+        db.session.execute(text('DELETE FROM posts_fts WHERE rowid = :id'), {'id': post_id})
+
+
+def reindex_all(connection=None):
+    """Rebuild the search index for every post; returns the number indexed"""
+    conn = connection if connection is not None else db.session
+    dialect = connection.dialect.name if connection is not None else _dialect()
+    if dialect == 'postgresql':
+        return conn.execute(text(f'UPDATE posts SET search_vector = {_PG_VECTOR}')).rowcount
+    conn.execute(text('DELETE FROM posts_fts'))
+    return conn.execute(text(
+        'INSERT INTO posts_fts (rowid, title, content) SELECT id, title, content FROM posts'
+    )).rowcount
+
+
+def _fts5_query(terms):
+    # Quote every term so user input can never be read as FTS5 syntax
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms.split())
+
+
+def search_post_ids(terms, published_only, limit, offset=0):
+    """Return [(post_id, rank)] best match first; a higher rank is better"""
+    params = {'limit': limit, 'offset': offset}
+    if _dialect() == 'postgresql':
+        sql = (
+            f"SELECT posts.id, ts_rank(posts.search_vector, query) AS rank "
+            f"FROM posts, websearch_to_tsquery('{SEARCH_CONFIG}', :terms) AS query "
+            f"WHERE posts.search_vector @@ query"
+        )
+        params['terms'] = terms
+    else:
+        fts_query = _fts5_query(terms)
+        if not fts_query:
+            return []
+        # bm25() is lower for better matches, so negate it
+        sql = (
+            "SELECT posts.id, -bm25(posts_fts, 10.0, 1.0) AS rank "
+            "FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid "
+            "WHERE posts_fts MATCH :terms"
+        )
+        params['terms'] = fts_query
+    if published_only:
+        sql += ' AND posts.published = :published'
+        params['published'] = True
+    sql += ' ORDER BY rank DESC, posts.id DESC LIMIT :limit OFFSET :offset'
+    return [(row.id, row.rank) for row in db.session.execute(text(sql), params)]
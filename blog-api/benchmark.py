@@ -0,0 +1,339 @@
+"""In-process benchmark of every API route.
+
+Drives create_app() through the Flask test client against a seeded
+database and reports p50/p95/p99 latency, SQL statements per request and
+memory allocated per request. Results can be saved as a baseline and later
+runs compared to it.
+
+The database is a temporary SQLite file. DATABASE_URL is ignored, as the
+run drops and recreates every table; point it at another database with
+--database-url URL --allow-drop.
+
+    python benchmark.py                      # run and print the report
+    python benchmark.py --save-baseline      # record bench_baseline.json
+    python benchmark.py --compare            # fail if slower than the baseline
+    python benchmark.py --json               # compare JSON encoders on listings
+"""
+import argparse
+import itertools
+import json
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_USERS = {'admin': 'admin', 'author': 'author', 'reader': 'user',
+               'role_target': 'user', 'leaver': 'user'}
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baseline.json')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--only', help='comma separated endpoint names to run')
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true', help='exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed p95 slowdown before a route counts as regressed')
+    parser.add_argument('--json', action='store_true',
+                        help='only time the JSON providers encoding large listings')
+    parser.add_argument('--database-url', help='benchmark this database instead of a temporary SQLite file')
+    parser.add_argument('--allow-drop', action='store_true',
+                        help='confirm that --database-url may be wiped and reseeded')
+    args = parser.parse_args()
+    if args.database_url and not args.allow_drop:
+        parser.error('--database-url drops every table in that database; add --allow-drop to confirm')
+    return args
+
+
+def build_app(args):
+    """Create the app on a fresh database seeded with generate_data"""
+    # Keep the report readable; timings are taken here, not from the log
+    os.environ.setdefault('REQUEST_LOG', 'false')
+    url = args.database_url
+    if not url:
+        url = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='bloghub-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = url
+
+    from app import create_app, db
+    from app.datagen import generate_data
+    from app.search import reindex_all
+
+    from app.models import User
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        password_hash = app.extensions['password_hasher'].hash('password')
+        with db.engine.connect() as conn:
+            generate_data(conn, args.users, args.posts, args.comments, password_hash=password_hash,
+                          seed=42, echo=lambda line: None)
+            reindex_all(conn)
+            conn.commit()
+        # Known callers for the scenarios; the separate users take the
+        # requests that revoke their own (leaver) or another's (target) tokens
+        for name, role in BENCH_USERS.items():
+            db.session.add(User(username=f'bench_{name}', email=f'bench_{name}@example.com',
+                                password_hash=password_hash, role=role))
+        db.session.commit()
+    return app
+
+
+class Context:
+    """Tokens and ids the scenarios build their requests from"""
+
+    def __init__(self, app):
+        from app import db
+        from app.models import User, Post
+
+        self.app = app
+        self.counter = itertools.count()
+        with app.app_context():
+            admin, author, reader, role_target, leaver = [
+                User.query.filter_by(username=f'bench_{name}').one() for name in BENCH_USERS
+            ]
+            self.admin = {'x-access-token': admin.generate_auth_token()}
+            self.author = {'x-access-token': author.generate_auth_token()}
+            self.reader = {'x-access-token': reader.generate_auth_token()}
+            self.author_id = author.id
+            self.role_target_id, self.leaver_id = role_target.id, leaver.id
+            self.reader_email = reader.email
+            # The most commented published post
+            self.post_id = db.session.query(Post.id).filter(Post.published.is_(True)) \
+                .order_by(Post.comment_count.desc()).limit(1).scalar()
+            self.own_post_id = db.session.query(Post.id).filter(Post.author_id == author.id) \
+                .limit(1).scalar() or self.new_post()
+            # Ten published posts for the batch scenarios
+            self.batch_ids = [post_id for post_id, in db.session.query(Post.id)
+                              .filter(Post.published.is_(True)).order_by(Post.id).limit(10)]
+
+    def unique(self, prefix):
+        return f'{prefix}{next(self.counter)}_{os.getpid()}'
+
+    def new_post(self):
+        """Insert a post by the author directly, outside the timed region"""
+        from app import db
+        from app.models import Post
+        with self.app.app_context():
+            post = Post(title='bench', content='bench post', slug=self.unique('bench-'),
+                        author_id=self.author_id, published=True)
+            db.session.add(post)
+            db.session.commit()
+            return post.id
+
+    def fresh_token(self, user_id):
+        from app import db
+        from app.models import User
+        with self.app.app_context():
+            return {'x-access-token': db.session.get(User, user_id).generate_auth_token()}
+
+
+def uncached_listing(c):
+    # Retire the cached pages before each call so the database path is timed
+    c.app.extensions['response_cache'].invalidate_listing()
+    return dict(method='GET', path='/api/posts', headers=c.reader)
+
+
+def uncached_post(c):
+    c.app.extensions['response_cache'].invalidate_post(c.post_id)
+    return dict(method='GET', path=f'/api/posts/{c.post_id}', headers=c.reader)
+
+
+# endpoint -> (timed-request limit or None, prepare(ctx) -> client request kwargs).
+# 'endpoint?variant' entries time another form of the same route; the
+# cached reads also get an ?uncached variant that always misses the cache.
+SCENARIOS = {
+    'api.home': (None, lambda c: dict(method='GET', path='/api/')),
+    'api.ready': (None, lambda c: dict(method='GET', path='/api/ready')),
+    'api.debug_routes': (None, lambda c: dict(method='GET', path='/api/debug/routes')),
+    'api.register': (20, lambda c: dict(method='POST', path='/api/register', json={
+        'username': c.unique('bench'), 'email': c.unique('bench') + '@example.com',
+        'password': 'password'})),
+    'api.login': (20, lambda c: dict(method='POST', path='/api/login', json={
+        'email': c.reader_email, 'password': 'password'})),
+    'api.logout': (None, lambda c: dict(method='POST', path='/api/logout',
+                                        headers=c.fresh_token(c.leaver_id))),
+    'api.get_posts': (None, lambda c: dict(method='GET', path='/api/posts', headers=c.reader)),
+    'api.get_posts?uncached': (None, uncached_listing),
+    'api.get_posts?ids': (None, lambda c: dict(method='GET', path=f"/api/posts?ids={','.join(map(str, c.batch_ids))}",
+                                               headers=c.reader)),
+    'api.search_posts': (None, lambda c: dict(method='GET', path='/api/posts/search?q=flask+cache',
+                                              headers=c.reader)),
+    'api.create_post': (None, lambda c: dict(method='POST', path='/api/posts', headers=c.author, json={
+        'title': c.unique('Bench post '), 'content': 'benchmark ' * 200, 'published': True})),
+    'api.get_post': (None, lambda c: dict(method='GET', path=f'/api/posts/{c.post_id}', headers=c.reader)),
+    'api.get_post?uncached': (None, uncached_post),
+    'api.get_comments': (None, lambda c: dict(method='GET', path=f'/api/posts/{c.post_id}/comments',
+                                              headers=c.reader)),
+    'api.update_post': (None, lambda c: dict(method='PUT', path=f'/api/posts/{c.own_post_id}',
+                                             headers=c.author, json={'content': 'updated ' * 200})),
+    'api.delete_post': (None, lambda c: dict(method='DELETE', path=f'/api/posts/{c.new_post()}',
+                                             headers=c.author)),
+    'api.create_comment': (None, lambda c: dict(method='POST', path=f'/api/posts/{c.post_id}/comments',
+                                                headers=c.reader, json={'content': 'nice post'})),
+    'api.create_comments': (None, lambda c: dict(method='POST', path='/api/comments', headers=c.reader, json={
+        'comments': [{'post_id': post_id, 'content': 'nice post'} for post_id in c.batch_ids]})),
+    'api.get_all_users': (None, lambda c: dict(method='GET', path='/api/admin/users', headers=c.admin)),
+    'api.update_user_role': (None, lambda c: dict(method='PUT', path=f'/api/admin/users/{c.role_target_id}/role',
+                                                  headers=c.admin, json={'role': 'user'})),
+    'api.cache_stats': (None, lambda c: dict(method='GET', path='/api/admin/cache/stats', headers=c.admin)),
+    'api.db_pool_stats': (None, lambda c: dict(method='GET', path='/api/admin/db/pool', headers=c.admin)),
+}
+
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_scenario(app, ctx, prepare, requests):
+    client = app.test_client()
+
+    def call():
+        kwargs = prepare(ctx)
+        method, path = kwargs.pop('method'), kwargs.pop('path')
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}')
+        # Statement counts come from the SQL instrumentation
+        match = QUERIES.search(response.headers.get('Server-Timing', ''))
+        return elapsed, int(match.group(1)) if match else 0
+
+    # Warm up caches and lazy imports, then time
+    for _ in range(min(5, requests)):
+        call()
+    latencies, queries = [], []
+    for _ in range(requests):
+        elapsed, count = call()
+        latencies.append(elapsed * 1000)
+        queries.append(count)
+
+    # Memory is measured on a separate pass because tracing slows every call
+    allocations = []
+    for _ in range(min(10, requests)):
+        tracemalloc.start()
+        call()
+        allocations.append(tracemalloc.get_traced_memory()[1] / 1024)
+        tracemalloc.stop()
+
+    return {
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'queries': round(statistics.mean(queries), 2),
+        'peak_kib': round(statistics.median(allocations), 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regression descriptions against baseline"""
+    problems = []
+    for endpoint, result in results.items():
+        before = baseline.get(endpoint)
+        if not before:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            problems.append(f"{endpoint}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        if result['queries'] > before['queries']:
+            problems.append(f"{endpoint}: queries {before['queries']} -> {result['queries']}")
+    return problems
+
+
+def benchmark_json(app, rounds=50):
+    """Median time for each JSON provider to encode listing payloads"""
+    from app.models import Post, Comment
+    from app.routes import post_summary_query, post_summary, comments_query, comment_summary
+    from app.serialization import JSONProvider, OrjsonProvider
+
+    with app.app_context():
+        posts = [post_summary(row) for row in post_summary_query().order_by(Post.id).limit(1000)]
+        post_id = Context(app).post_id
+        comments = [comment_summary(row) for row in comments_query(post_id).order_by(Comment.id).limit(1000)]
+    payloads = {
+        f'posts x{min(100, len(posts))}': {'posts': posts[:100], 'next_cursor': 'x'},
+        f'posts x{len(posts)}': {'posts': posts, 'next_cursor': 'x'},
+        f'comments x{len(comments)}': {'comments': comments, 'next_cursor': 'x'},
+    }
+
+    try:
+        fast = OrjsonProvider(app)
+    except ImportError:
+        print('orjson is not installed; nothing to compare', file=sys.stderr)
+        return 1
+    providers = {'stdlib': JSONProvider(app), 'orjson': fast}
+
+    print(f"{'payload':<18}{'KiB':>8}{'stdlib ms':>11}{'orjson ms':>11}{'speedup':>9}")
+    for name, payload in payloads.items():
+        timings = {}
+        for provider_name, provider in providers.items():
+            samples = []
+            for _ in range(rounds):
+                start = time.perf_counter()
+                body = provider.dumps(payload)
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[provider_name] = statistics.median(samples)
+        if json.loads(providers['stdlib'].dumps(payload)) != json.loads(body):
+            raise RuntimeError(f'{name}: providers disagree')
+        print(f"{name:<18}{len(body.encode()) / 1024:>8.0f}{timings['stdlib']:>11.3f}{timings['orjson']:>11.3f}"
+              f"{timings['stdlib'] / timings['orjson']:>8.1f}x")
+    return 0
+
+
+def main():
+    args = parse_args()
+    app = build_app(args)
+    if args.json:
+        return benchmark_json(app)
+
+    routes = sorted(rule.endpoint for rule in app.url_map.iter_rules() if rule.endpoint.startswith('api.'))
+    missing = [endpoint for endpoint in routes if endpoint not in SCENARIOS]
+    if missing:
+        print(f"No benchmark scenario for: {', '.join(missing)}", file=sys.stderr)
+
+    selected = args.only.split(',') if args.only else \
+        sorted(name for name in SCENARIOS if name.split('?')[0] in routes)
+    ctx = Context(app)
+    results = {}
+    print(f"{'endpoint':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KiB':>10}")
+    for endpoint in selected:
+        if endpoint not in SCENARIOS:
+            continue
+        limit, prepare = SCENARIOS[endpoint]
+        requests = min(args.requests, limit) if limit else args.requests
+        result = results[endpoint] = run_scenario(app, ctx, prepare, requests)
+        print(f"{endpoint:<24}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+              f"{result['queries']:>9}{result['peak_kib']:>10}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first", file=sys.stderr)
+            return 1
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        return 1 if problems or missing else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
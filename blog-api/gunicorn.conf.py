@@ -0,0 +1,64 @@
+import glob
+import multiprocessing
+import os
+
+# Gunicorn settings for production; every value can be overridden from the
+# environment. Run with: gunicorn -c gunicorn.conf.py wsgi:app
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+
+# Import the app once in the master so workers fork with the code already loaded
+preload_app = True
+
+# Threaded workers: processes for CPU, threads to overlap DB and network waits
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+
+# Recycle each worker after a jittered number of requests so restarts are
+# staggered, and give in-flight requests time to finish on shutdown
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", 200))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+
+accesslog = os.getenv("GUNICORN_ACCESSLOG")
+errorlog = "-"
+
+
+def on_starting(server):
+    # Read-your-writes pins must be visible to every worker, which only the
+    # shared response cache backend provides
+    if os.getenv("REPLICA_DATABASE_URL") and server.cfg.workers > 1 and not os.getenv("RESPONSE_CACHE_URL"):
+        raise RuntimeError("REPLICA_DATABASE_URL with several workers needs RESPONSE_CACHE_URL")
+
+    # Worker metric snapshots and exited-worker totals from a previous run
+    # would be summed in
+    metrics_dir = os.getenv("METRICS_DIR") or os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        paths = glob.glob(os.path.join(metrics_dir, "worker-*.json"))
+        paths.append(os.path.join(metrics_dir, "exited-workers.json"))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def post_fork(server, worker):
+    # Connections the master opened while preloading must not be shared:
+    # drop them from the inherited pools without closing the parent's sockets
+    from app import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def worker_exit(server, worker):
+    # Snapshots are written at most every METRICS_FLUSH_INTERVAL; a recycled
+    # worker writes its last one so exited-workers.json has every request
+    from app.metrics import flush_metrics
+    from wsgi import app
+
+    flush_metrics(app)
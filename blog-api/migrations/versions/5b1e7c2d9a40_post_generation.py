@@ -0,0 +1,30 @@
+"""generation counter for post listing validators
+
+Revision ID: 5b1e7c2d9a40
+Revises: cc00b5c6b4ad
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e7c2d9a40'
+down_revision = 'cc00b5c6b4ad'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    generations = op.create_table(
+        'generations',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.Integer(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(generations, [{'name': 'posts', 'value': 0}])
+
+
+def downgrade():
+    op.drop_table('generations')
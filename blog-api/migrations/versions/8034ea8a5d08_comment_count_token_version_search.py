@@ -0,0 +1,51 @@
+"""comment counter, token version and search index
+
+Revision ID: 8034ea8a5d08
+Revises: d22a2616768c
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8034ea8a5d08'
+down_revision = 'd22a2616768c'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
+
+def upgrade():
+    op.add_column('posts', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE posts SET comment_count = '
+        '(SELECT count(*) FROM comments WHERE comments.post_id = posts.id)'
+    )
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('ALTER TABLE posts ADD COLUMN search_vector tsvector')
+        op.execute(f'UPDATE posts SET search_vector = {SEARCH_VECTOR}')
+        op.execute('CREATE INDEX ix_posts_search_vector ON posts USING GIN (search_vector)')
+    else:
+        op.execute('CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(title, content)')
+        op.execute('INSERT INTO posts_fts (rowid, title, content) SELECT id, title, content FROM posts')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_posts_search_vector')
+        op.execute('ALTER TABLE posts DROP COLUMN search_vector')
+    else:
+        op.execute('DROP TABLE IF EXISTS posts_fts')
+
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('token_version')
+    with op.batch_alter_table('posts') as batch_op:
+        batch_op.drop_column('comment_count')
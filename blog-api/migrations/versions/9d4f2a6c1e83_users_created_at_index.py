@@ -0,0 +1,24 @@
+"""index for the admin user listing
+
+Revision ID: 9d4f2a6c1e83
+Revises: 5b1e7c2d9a40
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d4f2a6c1e83'
+down_revision = '5b1e7c2d9a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_created_at_id', table_name='users')
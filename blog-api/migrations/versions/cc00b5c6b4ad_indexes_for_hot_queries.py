@@ -0,0 +1,28 @@
+"""indexes for the post listing, author posts and comment pages
+
+Revision ID: cc00b5c6b4ad
+Revises: 8034ea8a5d08
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'cc00b5c6b4ad'
+down_revision = '8034ea8a5d08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_posts_published_created_at', 'posts', ['published', 'created_at'], unique=False)
+    op.create_index('ix_posts_author_id', 'posts', ['author_id'], unique=False)
+    op.create_index('ix_comments_post_id_created_at', 'comments', ['post_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_comments_post_id_created_at', table_name='comments')
+    op.drop_index('ix_posts_author_id', table_name='posts')
+    op.drop_index('ix_posts_published_created_at', table_name='posts')
@@ -0,0 +1,24 @@
+"""index for the admin post listing
+
+Revision ID: e3a8b61f0c27
+Revises: 9d4f2a6c1e83
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a8b61f0c27'
+down_revision = '9d4f2a6c1e83'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
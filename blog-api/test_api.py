@@ -85,7 +85,7 @@ def test_get_posts(token):
     print(f"Status Code: {response.status_code}")
     
     if response.status_code == 200:
-        posts = response.json()
+        posts = response.json()['posts']
         print(f"Found {len(posts)} posts:")
         for i, post in enumerate(posts, 1):
             print(f"{i}. {post['title']} by {post['author']}")
@@ -0,0 +1,47 @@
+import pytest
+from app import create_app, db
+from app.config import Config
+from app.models import User
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    """Build an app on a fresh SQLite file; keyword arguments override Config"""
+    def make(**settings):
+        settings.setdefault('SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'blog.db'}")
+        settings.setdefault('SECRET_KEY', 'test-secret-key-that-is-long-enough')
+        settings.setdefault('PASSWORD_HASH_ITERATIONS', 1000)
+        settings.setdefault('REQUEST_LOG', False)
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value)
+        app = create_app()
+        with app.app_context():
+            # The primary only: a replica bind registered by an earlier app stays
+            # in db.metadatas, and replicas are copied from the primary anyway
+            db.create_all(bind_key=None)
+        return app
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def register(app, client, username, role='user'):
+    """Create a user with role and return the headers that authenticate as them"""
+    response = client.post('/api/register', json={
+        'username': username, 'email': f'{username}@example.com', 'password': 'password'
+    })
+    assert response.status_code == 201, response.get_json()
+    if role != 'user':
+        with app.app_context():
+            user = db.session.get(User, response.get_json()['user']['id'])
+            user.role = role
+            db.session.commit()
+    return {'x-access-token': response.get_json()['token']}
@@ -0,0 +1,15 @@
+from tests.conftest import register
+
+
+def test_user_listing_counts_each_users_posts(app, client):
+    admin = register(app, client, 'admin', 'admin')
+    author = register(app, client, 'author', 'author')
+    register(app, client, 'reader')
+    for i in range(3):
+        client.post('/api/posts', headers=author, json={'title': f'Post {i}', 'content': 'body'})
+
+    first = client.get('/api/admin/users?limit=2&fields=username,post_count', headers=admin).get_json()
+    rest = client.get(f"/api/admin/users?limit=2&fields=username,post_count&cursor={first['next_cursor']}",
+                      headers=admin).get_json()
+    counts = {user['username']: user['post_count'] for user in first['users'] + rest['users']}
+    assert counts == {'admin': 0, 'author': 3, 'reader': 0}
@@ -0,0 +1,87 @@
+import re
+
+import pytest
+from app import db
+from app.auth import load_principal, principal_cache
+from app.models import User
+from tests.conftest import register
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def query_count(response):
+    return int(QUERIES.search(response.headers['Server-Timing']).group(1))
+
+
+@pytest.fixture
+def stateless_app(make_app):
+    return make_app(JWT_STATELESS=True)
+
+
+def login(client, username):
+    """Log in again so the token carries the user's current role"""
+    response = client.post('/api/login', json={'email': f'{username}@example.com', 'password': 'password'})
+    assert response.status_code == 200, response.get_json()
+    return {'x-access-token': response.get_json()['token']}
+
+
+def test_principal_is_evicted_when_the_change_commits(app, client):
+    register(app, client, 'reader')
+    with app.app_context():
+        user = User.query.filter_by(username='reader').one()
+        load_principal(user.id)
+
+        user.role = 'author'
+        db.session.flush()
+        # Not yet committed: a reader re-caching now would get the old row
+        assert principal_cache().get(user.id).role == 'user'
+
+        db.session.commit()
+        assert principal_cache().get(user.id) is None
+        assert load_principal(user.id).role == 'author'
+
+
+def test_role_change_revokes_old_tokens(app, client):
+    admin = register(app, client, 'admin', 'admin')
+    reader = register(app, client, 'reader')
+    with app.app_context():
+        user_id = User.query.filter_by(username='reader').one().id
+
+    assert client.get('/api/posts', headers=reader).status_code == 200
+    assert client.put(f'/api/admin/users/{user_id}/role', headers=admin, json={'role': 'author'}).status_code == 200
+    assert client.get('/api/posts', headers=reader).status_code == 401
+
+
+def test_stateless_token_authorizes_without_loading_the_user(stateless_app):
+    app, client = stateless_app, stateless_app.test_client()
+    register(app, client, 'admin', 'admin')
+    admin = login(client, 'admin')
+
+    # A cold version cache costs one token_version lookup, never the user row
+    response = client.get('/api/admin/cache/stats', headers=admin)
+    assert response.status_code == 200
+    assert query_count(response) == 1
+
+    response = client.get('/api/admin/cache/stats', headers=admin)
+    assert response.status_code == 200
+    assert query_count(response) == 0
+    principal = response.get_json()['principal']
+    assert (principal['hits'], principal['misses']) == (0, 0)
+
+
+def test_role_change_and_logout_revoke_stateless_tokens(stateless_app):
+    app, client = stateless_app, stateless_app.test_client()
+    register(app, client, 'admin', 'admin')
+    admin = login(client, 'admin')
+    reader = register(app, client, 'reader')
+    with app.app_context():
+        user_id = User.query.filter_by(username='reader').one().id
+
+    assert client.get('/api/posts', headers=reader).status_code == 200
+    assert client.put(f'/api/admin/users/{user_id}/role', headers=admin, json={'role': 'author'}).status_code == 200
+    assert client.get('/api/posts', headers=reader).status_code == 401
+
+    author = login(client, 'reader')
+    assert client.get('/api/posts', headers=author).status_code == 200
+    assert client.post('/api/logout', headers=author).status_code == 200
+    assert client.get('/api/posts', headers=author).status_code == 401
@@ -0,0 +1,21 @@
+from tests.conftest import register
+
+
+def test_batch_items_match_single_posts(app, client):
+    author = register(app, client, 'author', 'author')
+    reader = register(app, client, 'reader')
+    ids = []
+    for i, published in enumerate([True, True, False]):
+        ids.append(client.post('/api/posts', headers=author, json={
+            'title': f'Post {i}', 'content': 'body', 'published': published
+        }).get_json()['post']['id'])
+    client.post('/api/comments', headers=author, json={'comments': [
+        {'post_id': ids[0], 'content': f'comment {i}'} for i in range(25)
+    ] + [{'post_id': ids[1], 'content': 'only'}]})
+
+    data = client.get(f"/api/posts?ids={','.join(map(str, ids))}", headers=reader).get_json()
+    assert data['missing'] == [ids[2]]
+    assert [post['id'] for post in data['posts']] == ids[:2]
+    assert len(data['posts'][0]['comments']) == 20
+    for post in data['posts']:
+        assert post == client.get(f"/api/posts/{post['id']}", headers=reader).get_json()
@@ -0,0 +1,88 @@
+import time
+import pytest
+from app import routes
+from app.cache import LocalCacheBackend, ResponseCache, SharedCacheBackend
+from tests.conftest import register
+
+
+def test_edit_during_a_read_is_not_hidden_by_its_cache_entry(app, client, monkeypatch):
+    author = register(app, client, 'author', 'author')
+    reader = register(app, client, 'reader')
+    post_id = client.post('/api/posts', headers=author, json={
+        'title': 'Old title', 'content': 'body', 'published': True
+    }).get_json()['post']['id']
+
+    # An edit commits and invalidates after the read loads the post but
+    # before it stores the response
+    comments_page = routes.comments_page
+
+    def read_then_edit(*args, **kwargs):
+        page = comments_page(*args, **kwargs)
+        monkeypatch.setattr(routes, 'comments_page', comments_page)
+        assert client.put(f'/api/posts/{post_id}', headers=author, json={'title': 'New title'}).status_code == 200
+        return page
+
+    monkeypatch.setattr(routes, 'comments_page', read_then_edit)
+    assert client.get(f'/api/posts/{post_id}', headers=reader).get_json()['title'] == 'Old title'
+    assert client.get(f'/api/posts/{post_id}', headers=reader).get_json()['title'] == 'New title'
+
+
+class FakeRedis:
+    """Just the redis-py calls SharedCacheBackend makes for counters"""
+
+    def __init__(self):
+        self.data = {}
+
+    def _live(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and self._live(key) is not None:
+            return None
+        self.data[key] = (value, time.monotonic() + ex if ex else None)
+        return True
+
+    def incr(self, key):
+        value = int(self._live(key) or 0) + 1
+        self.data[key] = (value, self.data.get(key, (None, None))[1])
+        return value
+
+    def expire(self, key, ex):
+        self.data[key] = (self.data[key][0], time.monotonic() + ex)
+
+    def pipeline(self):
+        redis, calls = self, []
+
+        class Pipeline:
+            def __getattr__(self, name):
+                return lambda *args, **kwargs: calls.append((name, args, kwargs))
+
+            def execute(self):
+                return [getattr(redis, name)(*args, **kwargs) for name, args, kwargs in calls]
+
+        return Pipeline()
+
+
+@pytest.mark.parametrize('backend', [LocalCacheBackend, lambda: SharedCacheBackend(FakeRedis())])
+def test_post_generations_expire_without_reusing_values(backend):
+    cache = ResponseCache(backend(), ttl=300)
+    assert cache.generation_ttl > 300
+    cache.generation_ttl = 0.05
+
+    keys = [cache.post_key(1)]
+    for _ in range(2):
+        cache.invalidate_post(1)
+        keys.append(cache.post_key(1))
+    time.sleep(0.1)
+    assert cache.backend.get('post:1:generation') is None
+
+    cache.invalidate_post(1)
+    assert cache.post_key(1) not in keys
+    assert len(set(keys)) == 3
@@ -0,0 +1,28 @@
+from app import db
+from app.models import Post
+from app.pool import statement_timeout_disabled
+from tests.conftest import register
+
+
+def test_maintenance_commands_outlast_the_statement_timeout(make_app):
+    app = make_app(DB_STATEMENT_TIMEOUT_MS=1)
+    client = app.test_client()
+    register(app, client, 'author', 'author')
+    with app.app_context():
+        # Enough rows that a table-wide statement takes well over 1 ms
+        with statement_timeout_disabled(db.session.connection()):
+            db.session.execute(Post.__table__.insert(), [
+                {'title': f'Post {i}', 'slug': f'post-{i}', 'content': 'body ' * 50,
+                 'published': True, 'author_id': 1, 'comment_count': 1}
+                for i in range(20000)
+            ])
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    for command, output in (('recount-comments', 'Recounted comments for 20000 posts'),
+                            ('reindex-posts', 'Indexed 20000 posts')):
+        result = runner.invoke(args=[command])
+        assert result.exception is None, result.output
+        assert output in result.output
+    with app.app_context(), statement_timeout_disabled(db.session.connection()):
+        assert db.session.query(db.func.sum(Post.comment_count)).scalar() == 0
@@ -0,0 +1,37 @@
+import re
+from app import db
+from app.models import Post
+from tests.conftest import register
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def query_count(response):
+    return int(QUERIES.search(response.headers['Server-Timing']).group(1))
+
+
+def test_comment_counts_follow_comments(app, client):
+    author = register(app, client, 'author', 'author')
+    post_id = client.post('/api/posts', headers=author,
+                          json={'title': 'Post', 'content': 'body', 'published': True}).get_json()['post']['id']
+    for i in range(3):
+        client.post(f'/api/posts/{post_id}/comments', headers=author, json={'content': f'comment {i}'})
+    client.post('/api/comments', headers=author, json={'comments': [
+        {'post_id': post_id, 'content': 'batched'}, {'post_id': post_id, 'content': 'batched too'}
+    ]})
+
+    with app.app_context():
+        assert db.session.get(Post, post_id).comment_count == 5
+
+
+def test_deleting_a_post_does_not_update_it_per_comment(app, client):
+    author = register(app, client, 'author', 'author')
+    post_id = client.post('/api/posts', headers=author,
+                          json={'title': 'Post', 'content': 'body', 'published': True}).get_json()['post']['id']
+    client.post('/api/comments', headers=author, json={'comments': [
+        {'post_id': post_id, 'content': f'comment {i}'} for i in range(50)
+    ]})
+
+    response = client.delete(f'/api/posts/{post_id}', headers=author)
+    assert response.status_code == 200
+    assert query_count(response) < 10
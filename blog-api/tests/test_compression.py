@@ -0,0 +1,81 @@
+import gzip
+import zlib
+import pytest
+from flask import Response, jsonify, request
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def app(make_app):
+    app = make_app(COMPRESS_ALGORITHMS='gzip', COMPRESS_MIN_SIZE=500)
+
+    @app.route('/test/json/<int:size>')
+    def sized_json(size):
+        return jsonify({'data': 'x' * size})
+
+    @app.route('/test/encoded')
+    def encoded():
+        return Response(gzip.compress(b'{"data": 1}' * 100), mimetype='application/json',
+                        headers={'Content-Encoding': 'gzip'})
+
+    @app.route('/test/conditional')
+    def conditional():
+        response = jsonify({'data': 'x' * 2000})
+        response.set_etag('v1')
+        return response.make_conditional(request)
+
+    @app.route('/test/stream')
+    def stream():
+        def generate():
+            for i in range(3):
+                app.config['TEST_PRODUCED'].append(i)
+                yield f'chunk {i};' * 50
+        return Response(generate(), mimetype='text/plain')
+
+    app.config['TEST_PRODUCED'] = []
+    return app
+
+
+def test_gzip_only_above_the_minimum_size(client):
+    large = client.get('/test/json/2000', headers=GZIP)
+    assert large.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(large.get_data()).startswith(b'{"data":"xxx')
+    assert large.headers['Vary'] == 'Accept-Encoding'
+
+    small = client.get('/test/json/10', headers=GZIP)
+    assert 'Content-Encoding' not in small.headers
+    assert small.headers['Vary'] == 'Accept-Encoding'
+
+    identity = client.get('/test/json/2000')
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.headers['Vary'] == 'Accept-Encoding'
+
+
+def test_304s_and_encoded_responses_are_left_alone(client):
+    encoded = client.get('/test/encoded', headers=GZIP)
+    assert gzip.decompress(encoded.get_data()) == b'{"data": 1}' * 100
+
+    first = client.get('/test/conditional', headers=GZIP)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    assert first.headers['ETag'] == '"v1-gzip"'
+    not_modified = client.get('/test/conditional', headers=dict(GZIP, **{'If-None-Match': '"v1"'}))
+    assert not_modified.status_code == 304
+    assert 'Content-Encoding' not in not_modified.headers
+    assert not_modified.get_data() == b''
+
+
+def test_streams_are_compressed_chunk_by_chunk(app, client):
+    response = client.get('/test/stream', headers=GZIP, buffered=False)
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+
+    produced = app.config['TEST_PRODUCED']
+    decoder = zlib.decompressobj(31)
+    body = iter(response.response)
+    # Each chunk is flushed as soon as it is produced, before the next one
+    first = decoder.decompress(next(body))
+    assert first == b'chunk 0;' * 50 and produced == [0]
+    rest = b''.join(decoder.decompress(data) for data in body) + decoder.flush()
+    assert rest == b'chunk 1;' * 50 + b'chunk 2;' * 50
+    response.close()
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+from werkzeug.http import http_date
+from tests.conftest import register
+
+# An If-Modified-Since later than anything in the database
+FUTURE = http_date(datetime.now(timezone.utc) + timedelta(days=1))
+
+
+def create_post(client, headers, title):
+    response = client.post('/api/posts', headers=headers,
+                           json={'title': title, 'content': 'body', 'published': True})
+    assert response.status_code == 201
+    return response.get_json()['post']['id']
+
+
+def test_listing_revalidates_after_deleting_an_older_post(app, client):
+    author = register(app, client, 'author', 'author')
+    reader = register(app, client, 'reader')
+    older = create_post(client, author, 'Older')
+    create_post(client, author, 'Newer')
+
+    first = client.get('/api/posts', headers=reader)
+    assert 'Last-Modified' not in first.headers
+    etag = first.headers['ETag']
+    assert client.get('/api/posts', headers={**reader, 'If-None-Match': etag}).status_code == 304
+
+    assert client.delete(f'/api/posts/{older}', headers=author).status_code == 200
+
+    response = client.get('/api/posts', headers={**reader, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [post['title'] for post in response.get_json()['posts']] == ['Newer']
+    assert client.get('/api/posts', headers={**reader, 'If-Modified-Since': FUTURE}).status_code == 200
+
+
+def test_post_detail_revalidates_after_a_new_comment(app, client):
+    author = register(app, client, 'author', 'author')
+    reader = register(app, client, 'reader')
+    post_id = create_post(client, author, 'Post')
+
+    first = client.get(f'/api/posts/{post_id}', headers=reader)
+    assert 'Last-Modified' not in first.headers
+    etag = first.headers['ETag']
+    assert client.get(f'/api/posts/{post_id}', headers={**reader, 'If-None-Match': etag}).status_code == 304
+
+    client.post(f'/api/posts/{post_id}/comments', headers=reader, json={'content': 'First!'})
+
+    response = client.get(f'/api/posts/{post_id}', headers={**reader, 'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [comment['content'] for comment in response.get_json()['comments']] == ['First!']
+    assert client.get(f'/api/posts/{post_id}', headers={**reader, 'If-Modified-Since': FUTURE}).status_code == 200
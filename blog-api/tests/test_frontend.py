@@ -0,0 +1,17 @@
+from flask import Flask
+
+
+def test_app_factory_serves_the_frontend_build(make_app, monkeypatch, tmp_path):
+    build = tmp_path / 'build'
+    (build / 'static' / 'js').mkdir(parents=True)
+    (build / 'index.html').write_text('<div id="root"></div>')
+    (build / 'static' / 'js' / 'main.3f4a1b2c.js').write_text('console.log(1)')
+    # create_app serves app/static; point every app at the temporary build
+    monkeypatch.setattr(Flask, 'static_folder', property(lambda self: str(build), lambda self, value: None))
+    client = make_app().test_client()
+
+    assert client.get('/posts/12').get_data(as_text=True) == '<div id="root"></div>'
+    bundle = client.get('/static/js/main.3f4a1b2c.js')
+    assert bundle.status_code == 200
+    assert 'immutable' in bundle.headers['Cache-Control']
+    assert client.get('/api/nope').status_code == 404
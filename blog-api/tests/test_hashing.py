@@ -0,0 +1,58 @@
+import multiprocessing
+import time
+from app import hashing
+from tests.conftest import register
+
+
+def test_login_answers_503_while_another_worker_hashes(make_app, monkeypatch):
+    app = make_app(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=0, PASSWORD_HASH_RETRY_AFTER=3)
+    client = app.test_client()
+    register(app, client, 'reader')
+
+    # A forked worker, as Gunicorn makes from the preloaded app, holds the
+    # only hashing slot on the host
+    fork = multiprocessing.get_context('fork')
+    entered, release = fork.Event(), fork.Event()
+
+    def blocking_check(password_hash, password):
+        entered.set()
+        release.wait(5)
+
+    monkeypatch.setattr(hashing, 'check_password_hash', blocking_check)
+    worker = fork.Process(target=app.extensions['password_hasher'].verify, args=('hash', 'password'))
+    worker.start()
+    try:
+        assert entered.wait(5)
+        response = client.post('/api/login', json={'email': 'reader@example.com', 'password': 'password'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '3'
+    finally:
+        release.set()
+        worker.join(5)
+        worker.kill()
+
+
+def test_permits_leaked_by_a_dead_worker_degrade_to_503(make_app, monkeypatch):
+    app = make_app(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_SIZE=1, PASSWORD_HASH_WAIT_TIMEOUT=0.2)
+    client = app.test_client()
+    register(app, client, 'reader')
+
+    # A worker killed mid-hash never gives its permits back
+    fork = multiprocessing.get_context('fork')
+    entered = fork.Event()
+
+    def blocking_check(password_hash, password):
+        entered.set()
+        time.sleep(60)
+
+    monkeypatch.setattr(hashing, 'check_password_hash', blocking_check)
+    worker = fork.Process(target=app.extensions['password_hasher'].verify, args=('hash', 'password'))
+    worker.start()
+    assert entered.wait(5)
+    worker.kill()
+    worker.join()
+
+    started = time.monotonic()
+    response = client.post('/api/login', json={'email': 'reader@example.com', 'password': 'password'})
+    assert response.status_code == 503
+    assert time.monotonic() - started < 5
@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+from app.metrics import flush_metrics
+
+
+def test_exited_workers_are_folded_into_one_file(make_app, tmp_path):
+    metrics_dir = tmp_path / 'metrics'
+    client = make_app(METRICS_DIR=str(metrics_dir)).test_client()
+
+    # A worker that has exited, as Gunicorn recycles them
+    worker = subprocess.Popen([sys.executable, '-c', 'pass'])
+    worker.wait()
+    (metrics_dir / f'worker-{worker.pid}.json').write_text(json.dumps({
+        'pid': worker.pid, 'requests': [['api.get_posts', 'GET', '200', 7]], 'durations': {},
+        'in_flight': 3, 'gauges': {}, 'caches': {'response': {'hits': 5, 'misses': 1}}
+    }))
+
+    line = 'bloghub_http_requests_total{endpoint="api.get_posts",method="GET",status="200"} 7'
+    for _ in range(2):
+        body = client.get('/metrics').get_data(as_text=True)
+        assert line in body
+        assert 'bloghub_http_requests_in_progress 1' in body
+        assert 'bloghub_cache_requests_total{cache="response",result="hit"} 5' in body
+    assert not (metrics_dir / f'worker-{worker.pid}.json').exists()
+    assert (metrics_dir / 'exited-workers.json').exists()
+
+
+def test_worker_exit_flushes_requests_since_the_last_snapshot(make_app, tmp_path):
+    metrics_dir = tmp_path / 'metrics'
+    worker_app = make_app(METRICS_DIR=str(metrics_dir), METRICS_FLUSH_INTERVAL=3600)
+    client = worker_app.test_client()
+    for _ in range(5):
+        client.get('/api/ready')
+
+    # What Gunicorn's worker_exit hook does, then the process is gone
+    flush_metrics(worker_app)
+    snapshot = json.loads(next(metrics_dir.glob('worker-*.json')).read_text())
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    snapshot['pid'] = exited.pid
+    for path in metrics_dir.glob('worker-*.json'):
+        path.unlink()
+    (metrics_dir / f'worker-{exited.pid}.json').write_text(json.dumps(snapshot))
+
+    body = make_app(METRICS_DIR=str(metrics_dir)).test_client().get('/metrics').get_data(as_text=True)
+    assert 'bloghub_http_requests_total{endpoint="api.ready",method="GET",status="200"} 5' in body
+    folded = json.loads((metrics_dir / 'exited-workers.json').read_text())
+    assert ['api.ready', 'GET', '200', 5] in folded['requests']
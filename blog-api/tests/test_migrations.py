@@ -0,0 +1,17 @@
+import os
+from flask_migrate import check, upgrade
+from app.query_plans import check_query_plans
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'migrations')
+
+
+def test_migrations_match_models_and_keep_hot_queries_indexed(make_app, tmp_path):
+    # A fresh database built by the migrations rather than create_all
+    app = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'migrated.db'}")
+    with app.app_context():
+        from app import db
+        db.drop_all(bind_key=None)
+        upgrade(directory=MIGRATIONS)
+        # Exits if autogenerate finds a difference, e.g. the search tables
+        check(directory=MIGRATIONS)
+        assert [(name, scans) for name, scans, plan in check_query_plans() if scans] == []
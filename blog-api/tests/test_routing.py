@@ -0,0 +1,38 @@
+import sqlite3
+from tests.conftest import register
+
+
+def copy_database(source, target):
+    """Bring the replica file up to date with the primary"""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+def test_replica_reads_are_not_cached_for_pinned_writers(make_app, tmp_path):
+    primary, replica = tmp_path / 'blog.db', tmp_path / 'replica.db'
+    app = make_app(REPLICA_DATABASE_URL=f'sqlite:///{replica}')
+    client = app.test_client()
+    author = register(app, client, 'author', 'author')
+    reader = register(app, client, 'reader')
+    copy_database(primary, replica)
+
+    response = client.post('/api/posts', headers=author,
+                           json={'title': 'Fresh', 'content': 'body', 'published': True})
+    assert response.status_code == 201
+
+    # The reader is served by the lagging replica, which has no post yet
+    assert client.get('/api/posts', headers=reader).get_json()['posts'] == []
+    # The author is pinned to the primary and must not get that listing from the cache
+    assert [post['title'] for post in client.get('/api/posts', headers=author).get_json()['posts']] == ['Fresh']
+
+    copy_database(primary, replica)
+    assert [post['title'] for post in client.get('/api/posts', headers=reader).get_json()['posts']] == ['Fresh']
+
+
+def test_pins_survive_cache_eviction(make_app, tmp_path):
+    app = make_app(REPLICA_DATABASE_URL=f"sqlite:///{tmp_path / 'replica.db'}", RESPONSE_CACHE_SIZE=2)
+    backend = app.extensions['response_cache'].backend
+    backend.flag('pin:user:1', 5)
+    for i in range(10):
+        backend.set(f'posts:0:{i}', 'page')
+    assert backend.flagged('pin:user:1')
@@ -0,0 +1,65 @@
+from app import routes
+from tests.conftest import register
+
+
+def create_post(client, headers, title, content='body', published=True):
+    return client.post('/api/posts', headers=headers, json={
+        'title': title, 'content': content, 'published': published
+    }).get_json()['post']['id']
+
+
+def search(client, headers, query):
+    response = client.get(f'/api/posts/search?{query}', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_matches_rank_title_hits_above_content_hits(app, client):
+    author = register(app, client, 'author', 'author')
+    in_content = create_post(client, author, 'Weekend notes', 'we baked sourdough bread')
+    in_title = create_post(client, author, 'Sourdough starter', 'flour and water')
+    create_post(client, author, 'Unrelated', 'nothing to see')
+
+    posts = search(client, author, 'q=sourdough')['posts']
+    assert [post['id'] for post in posts] == [in_title, in_content]
+    assert posts[0]['rank'] > posts[1]['rank']
+    # FTS5 syntax in the query is matched as plain words
+    assert search(client, author, 'q=sourdough%20OR%20%22')['posts'] == []
+
+
+def test_unpublished_posts_are_found_by_admins_only(app, client):
+    author = register(app, client, 'author', 'author')
+    admin = register(app, client, 'admin', 'admin')
+    reader = register(app, client, 'reader')
+    published = create_post(client, author, 'Draft ideas published')
+    draft = create_post(client, author, 'Draft ideas hidden', published=False)
+
+    assert [post['id'] for post in search(client, reader, 'q=draft')['posts']] == [published]
+    assert {post['id'] for post in search(client, admin, 'q=draft')['posts']} == {published, draft}
+
+
+def test_offset_paging_and_its_cap(app, client):
+    author = register(app, client, 'author', 'author')
+    ids = {create_post(client, author, f'Garden diary {i}') for i in range(5)}
+
+    first = search(client, author, 'q=garden&limit=2')
+    second = search(client, author, f"q=garden&limit=2&offset={first['next_offset']}")
+    last = search(client, author, f"q=garden&limit=2&offset={second['next_offset']}")
+    assert (first['next_offset'], second['next_offset'], last['next_offset']) == (2, 4, None)
+    assert {post['id'] for page in (first, second, last) for post in page['posts']} == ids
+
+    response = client.get(f'/api/posts/search?q=garden&offset={routes.MAX_SEARCH_OFFSET + 1}', headers=author)
+    assert response.status_code == 400
+
+
+def test_edits_and_deletes_update_the_index(app, client):
+    author = register(app, client, 'author', 'author')
+    post_id = create_post(client, author, 'Old heading')
+    other_id = create_post(client, author, 'Another heading')
+
+    client.put(f'/api/posts/{post_id}', headers=author, json={'title': 'Fresh heading'})
+    assert [post['id'] for post in search(client, author, 'q=fresh')['posts']] == [post_id]
+    assert search(client, author, 'q=old')['posts'] == []
+
+    client.delete(f'/api/posts/{other_id}', headers=author)
+    assert [post['id'] for post in search(client, author, 'q=heading')['posts']] == [post_id]